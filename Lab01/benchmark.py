@@ -0,0 +1,74 @@
+"""
+Lab-01. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import time
+import random
+
+from primes import primality, select_strategy
+
+numbers = [15492781, 15492787, 15492803,
+           15492811, 15492810, 15492833,
+           15492859, 15502547, 15520301, 15527509]
+
+# ranges of 10^6 elements: small numbers, numbers of the notebook and large numbers
+ranges = {
+    'small': range(1, 10 ** 6 + 1),
+    'notebook': range(15492781, 15492781 + 10 ** 6),
+    'large': range(10 ** 12, 10 ** 12 + 10 ** 6),
+}
+
+# slow strategies are measured on random sample of this size and extrapolated
+samples = {
+    'naive': 100,
+    'wheel': 10 ** 4,
+}
+# original strategy is not measured on inputs with larger numbers (single prime takes hours)
+NAIVE_LIMIT = 10 ** 8
+
+
+def measure(candidates, strategy):
+    """
+    Measures the time spent by the strategy to check the candidates.
+
+    :param candidates: list of numbers.
+    :param strategy: name of primality strategy.
+    :return: runtime in seconds.
+    """
+    start = time.time()
+    primality(candidates, strategy)
+    return time.time() - start
+
+
+def compare_strategies(name, candidates):
+    """
+    Prints runtime of each strategy on the candidates and its speedup over the original trial division.
+
+    :param name: name of the input.
+    :param candidates: list of numbers.
+    """
+    candidates = list(candidates)
+    print(f"Input {name}: {len(candidates)} numbers, automatically selected strategy: {select_strategy(candidates)}.")
+
+    t_naive = None
+    for strategy in ['naive', 'wheel', 'miller-rabin', 'sieve', None]:
+        if strategy == 'naive' and max(candidates) > NAIVE_LIMIT:
+            print(f"Strategy naive: skipped, numbers exceed {NAIVE_LIMIT}.")
+            continue
+        sample = random.Random(0).sample(candidates, min(samples.get(strategy, len(candidates)), len(candidates)))
+        runtime = measure(sample, strategy) * len(candidates) / len(sample)
+        extrapolated = ' (extrapolated)' if len(sample) < len(candidates) else ''
+        if strategy == 'naive':
+            t_naive = runtime
+        speedup = f", speedup {t_naive / max(runtime, 1e-9):.1f}" if t_naive else ''
+        print(f"Strategy {strategy or 'auto'}: {runtime:.4f} s{extrapolated}{speedup}.")
+    print()
+
+
+if __name__ == "__main__":
+    compare_strategies('numbers', numbers)
+    for name, candidates in ranges.items():
+        compare_strategies(name, candidates)
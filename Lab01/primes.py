@@ -0,0 +1,308 @@
+"""
+Lab-01. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+from math import isqrt
+from itertools import islice
+from functools import partial
+from multiprocessing import current_process, cpu_count, get_context
+
+# vectorized sieve requires numpy, otherwise bytearray sieve is used
+try:
+    from sieve import sieve_numbers
+except ImportError:
+    sieve_numbers = None
+
+# number of chunks per worker used to compute adaptive chunk size
+CHUNKS_PER_WORKER = 4
+# chunk size used when the length of input is not known in advance
+DEFAULT_CHUNKSIZE = 1024
+
+# numbers below this bound are checked by trial division over the wheel, above it - by Miller-Rabin test
+WHEEL_LIMIT = 1 << 20
+# bases of Miller-Rabin test that are sufficient for deterministic answer for every 64-bit number
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+# sieve is used when both span of the numbers and square root of the largest one (bound of sieving primes)
+# are at most this number of times greater than number of candidates
+SIEVE_DENSITY = 8
+
+
+def is_prime_naive(number):
+    """returns True if number
+    is prime, False otherwise"""
+    if number == 1:
+        return False
+    for dividor in range(2, number):
+        if number % dividor == 0:
+            return False
+    return True
+
+
+def is_prime_wheel(number):
+    """
+    Trial division bounded by square root of the number.
+    Besides 2 and 3 every prime has the form 6k-1 or 6k+1, so only these divisors are checked.
+
+    :param number: number to be checked.
+    :return: True if number is prime, False otherwise.
+    """
+    if number < 4:
+        return number > 1
+    if number % 2 == 0 or number % 3 == 0:
+        return False
+    dividor = 5
+    while dividor * dividor <= number:
+        if number % dividor == 0 or number % (dividor + 2) == 0:
+            return False
+        dividor += 6
+    return True
+
+
+def is_prime_miller_rabin(number):
+    """
+    Miller-Rabin primality test.
+    With the fixed set of bases the answer is exact for every number less than 2^64; for larger numbers it is
+    probabilistic.
+
+    :param number: number to be checked.
+    :return: True if number is prime, False otherwise.
+    """
+    if number < 2:
+        return False
+    for base in MILLER_RABIN_BASES:
+        if number % base == 0:
+            return number == base
+
+    # represent number - 1 as d * 2^s
+    d, s = number - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    for base in MILLER_RABIN_BASES:
+        x = pow(base, d, number)
+        if x == 1 or x == number - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % number
+            if x == number - 1:
+                break
+        else:
+            # base is a witness of compositeness
+            return False
+    return True
+
+
+def small_primes(limit):
+    """
+    Classic sieve of Eratosthenes used to obtain the primes crossing out the windows.
+
+    :param limit: largest number to be checked.
+    :return: list of primes not greater than limit.
+    """
+    if limit < 2:
+        return []
+    mask = bytearray([1]) * (limit + 1)
+    mask[0] = mask[1] = 0
+    for number in range(2, isqrt(limit) + 1):
+        if mask[number]:
+            mask[number * number::number] = bytes(len(range(number * number, limit + 1, number)))
+    return [number for number, prime in enumerate(mask) if prime]
+
+
+def sieve_range(low, high):
+    """
+    Sieve of Eratosthenes over the window [low, high).
+    Crosses out multiples of primes up to square root of high, so memory is proportional to the width of the window.
+
+    :param low: first number of the window.
+    :param high: number following the last number of the window.
+    :return: bytearray, where element i is 1 if low + i is prime, 0 otherwise.
+    """
+    low = max(low, 0)
+    if high <= low:
+        return bytearray()
+    mask = bytearray([1]) * (high - low)
+    # 0 and 1 are not prime
+    for number in range(low, min(high, 2)):
+        mask[number - low] = 0
+
+    for prime in small_primes(isqrt(high - 1)):
+        # first multiple of prime within the window that is not the prime itself
+        first = max(prime * prime, (low + prime - 1) // prime * prime)
+        mask[first - low::prime] = bytes(len(range(first - low, high - low, prime)))
+    return mask
+
+
+def primality_sieve(numbers):
+    """
+    Checks the batch of numbers using a single sieve over the range they span.
+
+    :param numbers: list of numbers.
+    :return: list of booleans.
+    """
+    if not numbers:
+        return []
+    if sieve_numbers is not None:
+        return sieve_numbers(numbers)
+    low = max(min(numbers), 0)
+    mask = sieve_range(low, max(numbers) + 1)
+    return [number >= 0 and bool(mask[number - low]) for number in numbers]
+
+
+# dictionary with names of strategies as keys and functions checking single number as values
+strategies = {
+    'naive': is_prime_naive,
+    'wheel': is_prime_wheel,
+    'miller-rabin': is_prime_miller_rabin,
+}
+
+
+def is_prime(number, strategy=None):
+    """
+    Checks whether number is prime.
+    If strategy is not specified, small numbers are checked by the wheel and large numbers by Miller-Rabin test.
+
+    :param number: number to be checked.
+    :param strategy: name of strategy from the dictionary strategies (optional).
+    :return: True if number is prime, False otherwise.
+    """
+    if strategy is None:
+        strategy = 'wheel' if number < WHEEL_LIMIT else 'miller-rabin'
+    return strategies[strategy](number)
+
+
+def select_strategy(numbers):
+    """
+    Chooses the strategy for the batch of numbers by their size and density.
+    Dense batches are sieved, sparse ones are checked number by number.
+
+    :param numbers: list of numbers.
+    :return: name of strategy.
+    """
+    if not numbers:
+        return 'wheel'
+    low, high = min(numbers), max(numbers)
+    # there are no primes below 2, and square root of negative number is not real
+    if high < 2:
+        return 'wheel'
+    bound = SIEVE_DENSITY * len(numbers)
+    if high - low < bound and isqrt(high) < bound:
+        return 'sieve'
+    return 'wheel' if high < WHEEL_LIMIT else 'miller-rabin'
+
+
+def primality(numbers, strategy=None):
+    """
+    Checks whether each number of the batch is prime.
+
+    :param numbers: list of numbers.
+    :param strategy: name of strategy: 'sieve' or any from the dictionary strategies (default: chosen by
+    select_strategy).
+    :return: list of booleans.
+    """
+    numbers = list(numbers)
+    if strategy is None:
+        strategy = select_strategy(numbers)
+    if strategy == 'sieve':
+        return primality_sieve(numbers)
+    test = strategies[strategy]
+    return [test(number) for number in numbers]
+
+
+def adaptive_chunksize(count, workers):
+    """
+    Computes the number of candidates sent to a worker at once.
+    Input is split in several chunks per worker, so that the load stays balanced, while the number of round-trips to
+    the pool stays small.
+
+    :param count: number of candidates.
+    :param workers: number of processes in the pool.
+    :return: size of chunk.
+    """
+    chunksize, extra = divmod(count, workers * CHUNKS_PER_WORKER)
+    if extra:
+        chunksize += 1
+    return max(chunksize, 1)
+
+
+def split_chunks(iterable, chunksize):
+    """
+    Lazily splits iterable in lists of chunksize elements (the last one might be shorter).
+
+    :param iterable: sequence of candidates.
+    :param chunksize: size of chunk.
+    :return: generator of chunks.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def check_chunk(chunk, strategy=None):
+    """
+    Worker function passed to the pool.
+    Checks every number of the chunk and returns all the results at once, so that there is only one message per chunk.
+
+    :param chunk: list of numbers.
+    :param strategy: name of primality strategy (default: chosen for every chunk by select_strategy).
+    :return: name of process, list of pairs (number, whether number is prime).
+    """
+    return current_process().name, list(zip(chunk, primality(chunk, strategy)))
+
+
+def check_primes(iterable, workers=None, chunksize=None, info=None, strategy=None, start_method=None):
+    """
+    Checks whether the numbers are prime using pool of processes.
+    The input is partitioned in chunks (by default size of chunk is adapted to the number of candidates and workers),
+    chunks are distributed over the pool and results are streamed back chunk by chunk in the order of input.
+    If there is only one worker, numbers are checked in the current process without any interprocess communication.
+
+    :param iterable: numbers to be checked.
+    :param workers: number of processes (default: number of CPU cores).
+    :param chunksize: number of candidates sent to a worker at once.
+    :param info: dictionary to be filled with name of process that checked the number (optional).
+    :param strategy: name of primality strategy (default: chosen for every chunk by select_strategy).
+    :param start_method: method to start processes: 'fork', 'spawn' or 'forkserver' (default: platform's default).
+    :return: generator of pairs (number, whether number is prime).
+    """
+    workers = workers or cpu_count()
+    if chunksize is None:
+        if hasattr(iterable, '__len__'):
+            chunksize = adaptive_chunksize(len(iterable), workers)
+        else:
+            chunksize = DEFAULT_CHUNKSIZE
+    chunks = split_chunks(iterable, chunksize)
+    worker = partial(check_chunk, strategy=strategy)
+
+    if workers == 1:
+        results = map(worker, chunks)
+        yield from _collect(results, info)
+        return
+
+    with get_context(start_method).Pool(workers) as pool:
+        yield from _collect(pool.imap(worker, chunks), info)
+
+
+def _collect(results, info):
+    # flatten results of chunks and record the process that computed them
+    for name, chunk in results:
+        for number, prime in chunk:
+            if info is not None:
+                info[number] = name
+            yield number, prime
+
+
+if __name__ == "__main__":
+    numbers = [15492781, 15492787, 15492803,
+               15492811, 15492810, 15492833,
+               15492859, 15502547, 15520301, 15527509]
+    info = {}
+    for number, prime in check_primes(numbers, info=info):
+        print(f"Number {number} is {'prime' if prime else 'composite'}. Computed by {info[number]}.")
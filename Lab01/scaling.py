@@ -0,0 +1,116 @@
+"""
+Lab-01. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import sys
+import csv
+import json
+import time
+from collections import Counter
+from multiprocessing import cpu_count, get_all_start_methods
+
+from primes import check_primes
+
+# first number of the inputs, inputs are contiguous ranges as in the notebook
+FIRST = 15492781
+# parameters of the sweep
+SIZES = [10 ** 4, 10 ** 5]
+WORKERS = sorted({1, 2, 4, cpu_count()})
+CHUNKSIZES = [None, 64, 1024]
+START_METHODS = get_all_start_methods()
+# per-number strategy, so that the work is proportional to the number of candidates
+STRATEGY = 'miller-rabin'
+# each configuration is measured several times and the best runtime is taken
+REPEATS = 3
+
+
+def run(numbers, workers, chunksize, start_method):
+    """
+    Checks the numbers once and records which process checked each of them.
+
+    :param numbers: list of numbers.
+    :param workers: number of processes.
+    :param chunksize: number of candidates sent to a worker at once (None - adaptive).
+    :param start_method: method to start processes.
+    :return: runtime, dictionary with number as key and name of process as value.
+    """
+    info = {}
+    start = time.time()
+    for _ in check_primes(numbers, workers, chunksize, info, STRATEGY, start_method):
+        pass
+    return time.time() - start, info
+
+
+def load_imbalance(info, workers):
+    """
+    Computes relative excess of the most loaded worker over the mean load: 0 means perfectly balanced load.
+
+    :param info: dictionary with number as key and name of process as value.
+    :param workers: number of processes.
+    :return: load imbalance.
+    """
+    loads = list(Counter(info.values()).values())
+    # workers that did not get any chunk are counted with zero load
+    loads += [0] * (workers - len(loads))
+    mean = sum(loads) / len(loads)
+    return max(loads) / mean - 1
+
+
+def sweep():
+    """
+    Measures every combination of input size, start method, chunk size and number of workers.
+    Sequential runtime for the input size is the runtime of a single worker without the pool.
+
+    :return: list of records.
+    """
+    records = []
+    for size in SIZES:
+        numbers = list(range(FIRST, FIRST + size))
+        t_seq = min(run(numbers, 1, None, None)[0] for _ in range(REPEATS))
+        for start_method in START_METHODS:
+            for chunksize in CHUNKSIZES:
+                for workers in WORKERS:
+                    runs = [run(numbers, workers, chunksize, start_method) for _ in range(REPEATS)]
+                    t_par, info = min(runs, key=lambda x: x[0])
+                    speedup = t_seq / t_par
+                    record = {
+                        'size': size,
+                        'start_method': start_method,
+                        'chunksize': chunksize or 'adaptive',
+                        'workers': workers,
+                        't_seq': t_seq,
+                        't_par': t_par,
+                        'speedup': speedup,
+                        'efficiency': speedup / workers,
+                        'imbalance': load_imbalance(info, workers),
+                    }
+                    records.append(record)
+                    print(', '.join(f"{key}: {value}" for key, value in record.items()))
+    return records
+
+
+def save(records, path):
+    """
+    Saves the records in JSON or CSV format depending on the extension of the file.
+
+    :param records: list of records.
+    :param path: path to the output file.
+    """
+    with open(path, 'w', newline='') as output:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(output, fieldnames=list(records[0].keys()))
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            json.dump(records, output, indent=4)
+
+
+if __name__ == "__main__":
+    # parse command line argument
+    if len(sys.argv) != 2:
+        print("Usage example: python scaling.py <results.json|results.csv>")
+        sys.exit()
+    save(sweep(), sys.argv[1])
@@ -0,0 +1,131 @@
+"""
+Lab-01. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import time
+from math import isqrt
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
+# number of candidates sieved at once, bounds the memory used per segment
+SEGMENT_SIZE = 1 << 20
+
+
+def base_primes(limit):
+    """
+    Vectorized sieve of Eratosthenes over [0, limit].
+    The obtained primes are used to cross out the multiples in every segment.
+
+    :param limit: largest number to be checked.
+    :return: array of primes not greater than limit.
+    """
+    if limit < 2:
+        return np.array([], dtype=np.int64)
+    mask = np.ones(limit + 1, dtype=bool)
+    mask[:2] = False
+    for number in range(2, isqrt(limit) + 1):
+        if mask[number]:
+            mask[number * number::number] = False
+    return np.flatnonzero(mask)
+
+
+def sieve_segment(segment, primes):
+    """
+    Sieves a single segment [low, high) using the base primes.
+    Every prime crosses out its multiples by one slice assignment.
+
+    :param segment: pair (low, high).
+    :param primes: array of primes not greater than square root of high.
+    :return: boolean array, where element i is True if low + i is prime.
+    """
+    low, high = segment
+    mask = np.ones(high - low, dtype=bool)
+    # 0 and 1 are not prime
+    mask[:max(min(2, high) - low, 0)] = False
+    for prime in primes.tolist():
+        if prime * prime >= high:
+            break
+        # first multiple of prime within the segment that is not the prime itself
+        first = max(prime * prime, (low + prime - 1) // prime * prime)
+        mask[first - low::prime] = False
+    return mask
+
+
+def iter_segments(low, high, segment_size=SEGMENT_SIZE, workers=1):
+    """
+    Lazily sieves the window [low, high) segment by segment, so that only a few segments are kept in memory.
+    If there are several workers, segments are distributed over the pool of processes.
+
+    :param low: first number of the window.
+    :param high: number following the last number of the window.
+    :param segment_size: number of candidates in a segment.
+    :param workers: number of processes.
+    :return: generator of pairs (first number of segment, boolean mask of segment).
+    """
+    if low < 0:
+        raise ValueError("Window should start from non-negative number.")
+    if high <= low:
+        return
+    primes = base_primes(isqrt(high - 1))
+    segments = [(start, min(start + segment_size, high)) for start in range(low, high, segment_size)]
+    worker = partial(sieve_segment, primes=primes)
+
+    if workers == 1:
+        for segment in segments:
+            yield segment[0], worker(segment)
+        return
+
+    with Pool(workers) as pool:
+        for segment, mask in zip(segments, pool.imap(worker, segments)):
+            yield segment[0], mask
+
+
+def segmented_sieve(low, high, segment_size=SEGMENT_SIZE, workers=1):
+    """
+    Answers whether each number of the window [low, high) is prime in one call.
+
+    :param low: first number of the window.
+    :param high: number following the last number of the window.
+    :param segment_size: number of candidates in a segment.
+    :param workers: number of processes.
+    :return: boolean array, where element i is True if low + i is prime.
+    """
+    mask = np.zeros(max(high - low, 0), dtype=bool)
+    for start, segment in iter_segments(low, high, segment_size, workers):
+        mask[start - low:start - low + len(segment)] = segment
+    return mask
+
+
+def sieve_numbers(numbers):
+    """
+    Checks the batch of numbers using a single sieve over the window they span.
+
+    :param numbers: list of numbers.
+    :return: list of booleans.
+    """
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if not len(numbers):
+        return []
+    low = max(int(numbers.min()), 0)
+    mask = segmented_sieve(low, int(numbers.max()) + 1)
+    # negative numbers are not prime
+    result = np.zeros(len(numbers), dtype=bool)
+    valid = numbers >= low
+    result[valid] = mask[numbers[valid] - low]
+    return result.tolist()
+
+
+def primes_between(low, high, segment_size=SEGMENT_SIZE, workers=1):
+    # returns array of primes within the window [low, high)
+    return np.flatnonzero(segmented_sieve(low, high, segment_size, workers)) + low
+
+
+if __name__ == "__main__":
+    start = time.time()
+    mask = segmented_sieve(15492781, 15527509 + 1)
+    print(f"There are {mask.sum()} primes within [15492781, 15527509]. Runtime is {time.time() - start}.")
@@ -0,0 +1,68 @@
+"""
+Lab-02. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+from collections import OrderedDict
+
+# the same module is used by the calculator of Lab02 and the XML-RPC server of Lab05, the copies should stay identical
+# apart from the header
+
+# value returned by get if there is no such key, so that None can be cached as well
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded cache of computed values keyed on the raw request.
+    When the cache is full, the least recently used entry is evicted.
+    Counts hits, misses and evictions.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns cached value and marks it as recently used.
+
+        :param key: key of entry.
+        :return: cached value, MISSING if there is no such key.
+        """
+        value = self.entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Stores value and evicts the least recently used entry if the cache is full.
+
+        :param key: key of entry.
+        :param value: value to be cached.
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """
+        :return: dictionary with number of entries, hits, misses and evictions.
+        """
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -10,7 +10,48 @@ import socket
 HOST = '127.0.0.1'
 PORT = 65432
 SERVER_ADDRESS = (HOST, PORT)
-BUFFER = 100
+BUFFER = 65507
+# expressions in a batch are separated by a new line, results in the response are separated in the same way
+SEPARATOR = '\n'
+# limits of a single batch, so that both the request and the response fit in one datagram
+MAX_BATCH = 512
+MAX_BATCH_BYTES = 8192
+
+
+def split_batches(expressions):
+    """
+    Packs expressions in batches limited by the number of expressions and the size of datagram.
+
+    :param expressions: list of expressions.
+    :return: generator of lists of expressions.
+    """
+    batch, size = [], 0
+    for expression in expressions:
+        length = len(expression.encode()) + 1
+        if batch and (len(batch) == MAX_BATCH or size + length > MAX_BATCH_BYTES):
+            yield batch
+            batch, size = [], 0
+        batch.append(expression)
+        size += length
+    if batch:
+        yield batch
+
+
+def calculate_batch(sock, expressions, address=SERVER_ADDRESS):
+    """
+    Evaluates many expressions using one datagram per batch instead of one datagram per expression.
+
+    :param sock: UDP socket.
+    :param expressions: list of expressions in the form 'operator left_operand right_operand'.
+    :param address: address of the server.
+    :return: list of results (as strings) in the order of expressions.
+    """
+    results = []
+    for batch in split_batches(expressions):
+        sock.sendto(SEPARATOR.join(batch).encode(), address)
+        message, _ = sock.recvfrom(BUFFER)
+        results.extend(message.decode().split(SEPARATOR))
+    return results
 
 
 def client():
@@ -0,0 +1,218 @@
+"""
+Lab-02. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import sys
+import time
+import random
+import socket
+from threading import Thread
+
+HOST = '127.0.0.1'
+PORT = 65432
+SERVER_ADDRESS = (HOST, PORT)
+BUFFER = 65507
+
+# default parameters of the load
+CONCURRENCY = 4
+REQUESTS = 10000
+# total rate of requests per second, 0 means as fast as possible
+RATE = 0
+# time to wait for the response before the request is considered lost
+TIMEOUT = 1
+# share of each kind of expressions
+MIX = {
+    'valid': 85,
+    'zero': 5,
+    'nonnumeric': 5,
+    'operator': 5,
+}
+
+# functions generating expressions of each kind
+generators = {
+    'valid': lambda r: f"{r.choice(['*', '/', '-', '+', '>', '<', '>=', '<='])} {r.randint(-100, 100)} "
+                       f"{r.randint(1, 100)}",
+    'zero': lambda r: f"/ {r.randint(-100, 100)} 0",
+    'nonnumeric': lambda r: f"+ {r.randint(-100, 100)} abc",
+    'operator': lambda r: f"% {r.randint(-100, 100)} {r.randint(1, 100)}",
+}
+
+
+def percentile(values, q):
+    """
+    Computes percentile of the sorted values using the nearest rank.
+
+    :param values: sorted list of values.
+    :param q: percentile from 0 to 100.
+    :return: value of percentile (None if there are no values).
+    """
+    if not values:
+        return None
+    rank = max(int(round(q / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def open_socket():
+    # socket of the worker waiting for each response not longer than TIMEOUT
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(TIMEOUT)
+    return sock
+
+
+def retire(sock):
+    """
+    Receives responses already waiting in the socket without blocking and closes it.
+
+    :param sock: socket of the worker.
+    :return: number of received responses.
+    """
+    received = 0
+    sock.setblocking(False)
+    try:
+        while True:
+            sock.recvfrom(BUFFER)
+            received += 1
+    except BlockingIOError:
+        return received
+    finally:
+        sock.close()
+
+
+def worker(requests, interval, mix, seed, latencies, lost, late):
+    """
+    Worker function passed as target to Thread.
+    Sends the requests one by one from its own socket and waits for each response.
+    Rate is limited by sending requests not earlier than every interval seconds.
+    Request is lost if it is not answered within TIMEOUT. Responses do not identify requests, so that the response of
+    lost request might be taken as the response of the next one. Hence, after the request is lost, the next requests
+    are sent from a new socket; the previous socket is kept until the next loss (or the end), then responses that
+    came to it are counted as late.
+
+    :param requests: number of requests to send.
+    :param interval: minimal time between two requests of the worker.
+    :param mix: dictionary with kind of expression as key and its weight as value.
+    :param seed: seed of random generator.
+    :param latencies: list to which latencies of answered requests are appended.
+    :param lost: list to which number of lost requests is appended.
+    :param late: list to which number of responses received after TIMEOUT is appended.
+    """
+    r = random.Random(seed)
+    kinds, weights = list(mix.keys()), list(mix.values())
+    missed, delayed = 0, 0
+    # socket that has been used before the last lost request
+    retired = None
+    sock = open_socket()
+    try:
+        scheduled = time.perf_counter()
+        for _ in range(requests):
+            # wait until the scheduled time of the request
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            scheduled += interval
+
+            expression = generators[r.choices(kinds, weights)[0]](r)
+            start = time.perf_counter()
+            sock.sendto(expression.encode(), SERVER_ADDRESS)
+            try:
+                sock.recvfrom(BUFFER)
+                latencies.append(time.perf_counter() - start)
+            except socket.timeout:
+                missed += 1
+                if retired is not None:
+                    delayed += retire(retired)
+                retired, sock = sock, open_socket()
+    finally:
+        delayed += retire(sock)
+        if retired is not None:
+            delayed += retire(retired)
+    lost.append(missed)
+    late.append(delayed)
+
+
+def run(concurrency=CONCURRENCY, requests=REQUESTS, rate=RATE, mix=None):
+    """
+    Drives the calculator server with several concurrent clients and measures the performance.
+
+    :param concurrency: number of concurrent clients.
+    :param requests: total number of requests.
+    :param rate: total number of requests per second (0 - as fast as possible).
+    :param mix: dictionary with kind of expression as key and its weight as value.
+    :return: dictionary with statistics.
+    """
+    mix = mix or MIX
+    interval = concurrency / rate if rate else 0
+    latencies, lost, late = [], [], []
+    # distribute requests among the clients
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    threads = [Thread(target=worker, args=(share, interval, mix, i, latencies, lost, late))
+               for i, share in enumerate(shares)]
+
+    start = time.perf_counter()
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    runtime = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'answered': len(latencies),
+        'loss_rate': sum(lost) / requests if requests else 0,
+        'late': sum(late),
+        'rps': len(latencies) / runtime,
+        'p50_ms': (percentile(latencies, 50) or 0) * 1000,
+        'p95_ms': (percentile(latencies, 95) or 0) * 1000,
+        'p99_ms': (percentile(latencies, 99) or 0) * 1000,
+        'runtime': runtime,
+    }
+
+
+def parse_arguments():
+    """
+    Function used to parse and validate command line arguments of the form --name=value.
+    :return: number of concurrent clients, number of requests, rate, mix of expressions.
+    """
+    concurrency, requests, rate, mix = CONCURRENCY, REQUESTS, RATE, dict(MIX)
+    for argument in sys.argv[1:]:
+        if '=' not in argument:
+            raise Exception(f'Unknown argument: {argument}')
+        name, value = argument.split('=', 1)
+        try:
+            if name == '--concurrency':
+                concurrency = int(value)
+            elif name == '--requests':
+                requests = int(value)
+            elif name == '--rate':
+                rate = float(value)
+            elif name == '--mix':
+                mix = {kind: float(weight) for kind, weight in (pair.split(':') for pair in value.split(','))}
+            else:
+                raise Exception(f'Unknown argument: {argument}')
+        except ValueError:
+            raise Exception(f'Wrong value of argument: {argument}')
+    if concurrency < 1 or requests < 0 or rate < 0:
+        raise Exception('Parameters of the load should be positive.')
+    if any(kind not in generators for kind in mix):
+        raise Exception(f'Kinds of expressions: {", ".join(generators)}.')
+    return concurrency, requests, rate, mix
+
+
+if __name__ == '__main__':
+    # parse command line arguments
+    try:
+        concurrency, requests, rate, mix = parse_arguments()
+    except Exception as e:
+        print(e)
+        print("Usage example: python loadgen.py [--concurrency=4] [--requests=10000] [--rate=0] "
+              "[--mix=valid:85,zero:5,nonnumeric:5,operator:5]")
+        sys.exit()
+
+    statistics = run(concurrency, requests, rate, mix)
+    print(f"Requests: {statistics['requests']}, answered: {statistics['answered']}, "
+          f"loss rate: {statistics['loss_rate']:.2%}, late responses: {statistics['late']}.")
+    print(f"Throughput: {statistics['rps']:.1f} requests per second.")
+    print(f"Latency p50: {statistics['p50_ms']:.3f} ms, p95: {statistics['p95_ms']:.3f} ms, "
+          f"p99: {statistics['p99_ms']:.3f} ms.")
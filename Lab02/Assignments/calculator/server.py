@@ -5,12 +5,28 @@ Email: d.alukaev@innopolis.university
 Group:  B19-DS-01
 """
 
+import sys
 import socket
+import asyncio
+from multiprocessing import Process
+
+from cache import LRUCache, MISSING
+
+# vectorized evaluation of batches requires numpy, otherwise expressions are evaluated one by one
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 HOST = '127.0.0.1'
 PORT = 65432
 ADDRESS = (HOST, PORT)
-BUFFER = 100
+# large enough for the biggest UDP datagram, so that a batch of expressions fits in one message
+BUFFER = 65507
+# expressions in a batch are separated by a new line, results in the response are separated in the same way
+SEPARATOR = '\n'
+# batches of at least this number of expressions are evaluated column-wise with numpy
+VECTORIZE_THRESHOLD = 16
 
 
 class NoSuchOperatorError(Exception):
@@ -70,6 +86,33 @@ operations = {
 }
 
 
+def safe_division_vectorized(a, b):
+    """
+    Performs element-wise division of two arrays.
+    Instead of raising exception marks the rows with zero divisor.
+    :param a: array of left operands.
+    :param b: array of right operands.
+    :return: array of results (NaN for division by zero), boolean mask of rows with zero divisor.
+    """
+    zero = b == 0
+    result = np.divide(a, b, out=np.full_like(a, np.nan), where=~zero)
+    return result, zero
+
+
+# dictionary with operators as keys and numpy functions as values
+# used for column-wise evaluation of batches
+vectorized_operations = {
+    '*': np.multiply,
+    '/': safe_division_vectorized,
+    '-': np.subtract,
+    '+': np.add,
+    '>': np.greater,
+    '<': np.less,
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+} if np is not None else {}
+
+
 def valid_operator(operator):
     """
     Checks whether the symbol is supported by application.
@@ -124,13 +167,184 @@ def calculate_result(operator, left_operand, right_operand):
     return result
 
 
-def server():
+def parse_operands(operands):
+    """
+    Converts column of operands to floats at once.
+    If some operand is not numeric, falls back to the validation of each operand independently.
+    :param operands: list of symbols passed by user at the operand position.
+    :return: array of floats (NaN for non-numeric operands), boolean mask of numeric operands.
+    """
+    try:
+        values = np.fromiter(map(float, operands), dtype=np.float64, count=len(operands))
+        return values, np.ones(len(operands), dtype=bool)
+    except ValueError:
+        numeric = np.array([is_float(operand) for operand in operands], dtype=bool)
+        values = np.array([float(operand) if valid else np.nan for operand, valid in zip(operands, numeric)])
+        return values, numeric
+
+
+def calculate_results(expressions):
+    """
+    Column-wise counterpart of calculate_result for a batch of expressions.
+    Parses operators and operands into arrays, groups rows by operator and applies numpy function to each group.
+    Validity of operator and operands is checked in the same order as in calculate_result, so that each row gets the
+    same result or exception message as if it was computed separately.
+
+    :param expressions: list of strings in the form '<operator> <left operand> <right operand>'.
+    :return: list of results or exception messages.
+    """
+    results = np.full(len(expressions), "Unresolved exception occurred.", dtype=object)
+
+    # split expressions in columns, rows with wrong number of tokens keep the default message
+    separators = np.array([expression.count(' ') for expression in expressions])
+    rows = np.flatnonzero(separators == 2)
+    if not len(rows):
+        return results.tolist()
+    if len(rows) < len(expressions):
+        expressions = [expressions[row] for row in rows.tolist()]
+    # all remaining rows consist of three tokens, so the columns are slices of one flat list of tokens
+    tokens = ' '.join(expressions).split(' ')
+    operators, left_operands, right_operands = tokens[0::3], tokens[1::3], tokens[2::3]
+
+    operators = np.array(operators, dtype=np.str_)
+    left, left_numeric = parse_operands(left_operands)
+    right, right_numeric = parse_operands(right_operands)
+    valid = np.isin(operators, list(vectorized_operations)) & left_numeric & right_numeric
+
+    # compose exception messages for invalid rows
+    for i in np.flatnonzero(~valid).tolist():
+        if not valid_operator(operators[i]):
+            error = NoSuchOperatorError(f"No such operator found: {operators[i]}")
+        elif not left_numeric[i]:
+            error = NonNumericOperandError(f"Operand should be numeric: {left_operands[i]}")
+        else:
+            error = NonNumericOperandError(f"Operand should be numeric: {right_operands[i]}")
+        results[rows[i]] = error.message
+
+    # evaluate rows grouped by operator
+    with np.errstate(all='ignore'):
+        for operator, function in vectorized_operations.items():
+            group = np.flatnonzero(valid & (operators == operator))
+            if not len(group):
+                continue
+            values = function(left[group], right[group])
+            errors = None
+            if isinstance(values, tuple):
+                values, errors = values
+
+            if values.dtype == np.float64:
+                # convert float with zero after the point to int
+                integral = np.isfinite(values) & (values == np.floor(values))
+                converted = np.array(values.tolist(), dtype=object)
+                converted[integral] = [int(value) for value in values[integral].tolist()]
+                values = converted
+            else:
+                values = np.array(values.tolist(), dtype=object)
+
+            if errors is not None:
+                values[errors] = DivisionByZeroError().message
+            results[rows[group]] = values
+    return results.tolist()
+
+
+def evaluate(expression):
+    """
+    Evaluates single expression in the form '<operator> <left operand> <right operand>'.
+
+    :param expression: string with expression.
+    :return: result of computation or exception message if the operation cannot be performed.
+    """
+    try:
+        # parse tokens and try to calculate the result
+        operator, left_operand, right_operand = expression.split(' ')
+        return calculate_result(operator, left_operand, right_operand)
+    except Exception as e:
+        # set exception message as the result
+        return e.message if hasattr(e, 'message') else "Unresolved exception occurred."
+
+
+def evaluate_batch(message):
+    """
+    Evaluates all expressions of the message in one pass.
+    Message with a single expression is answered exactly as before.
+    Large batches are evaluated column-wise if numpy is available.
+
+    :param message: expressions separated by SEPARATOR.
+    :return: results separated by SEPARATOR.
+    """
+    expressions = message.split(SEPARATOR)
+    if np is not None and len(expressions) >= VECTORIZE_THRESHOLD:
+        results = calculate_results(expressions)
+    else:
+        results = [evaluate(expression) for expression in expressions]
+    return SEPARATOR.join(str(result) for result in results)
+
+
+def respond(message, address, verbose=True, cache=None):
+    """
+    Computes the response for a received datagram.
+    Shared by the blocking and asyncio servers, so that both of them keep the same wire format and error messages.
+    If cache is provided, identical requests (including the ones resulting in error) are answered without parsing and
+    computation.
+
+    :param message: received bytes.
+    :param address: address of the client.
+    :param verbose: whether to print each request and result.
+    :param cache: LRUCache of responses (optional).
+    :return: bytes to be sent to the client.
+    """
+    if cache is None:
+        return compute_response(message, address, verbose)
+    response = cache.get(message)
+    if response is MISSING:
+        response = compute_response(message, address, verbose)
+        cache.put(message, response)
+    elif verbose:
+        print(f"Request from {address}: {message.decode()}")
+        print(f"Cached result: {response.decode()}\n")
+    return response
+
+
+def compute_response(message, address, verbose=True):
+    """
+    Parses the datagram and evaluates expressions it contains.
+
+    :param message: received bytes.
+    :param address: address of the client.
+    :param verbose: whether to print each request and result.
+    :return: bytes to be sent to the client.
+    """
+    message = message.decode()
+    if SEPARATOR in message:
+        # batch is logged by one line instead of two lines per expression
+        result = evaluate_batch(message)
+        if verbose:
+            print(f"Batch of {message.count(SEPARATOR) + 1} expressions from {address}\n")
+    else:
+        if verbose:
+            print(f"Request from {address}: {message}")
+        result = evaluate(message)
+        if verbose:
+            print(f"Result: {result}\n")
+    response = str(result).encode()
+    if len(response) > BUFFER:
+        response = "Batch is too large.".encode()
+    return response
+
+
+def server(verbose=True, cache_size=0):
     """
     Server side of client-server calculator.
     Continually ready to receive command from the client application.
     Determines type of the operation to perform and compute the result.
     If the operation cannot be performed server catches exception and send exception message to client.
+    Datagram might contain a batch of expressions separated by a new line, then all of them are answered in a single
+    datagram with results separated in the same way.
+
+    :param verbose: whether to print each request and result.
+    :param cache_size: number of cached responses (0 - cache is disabled).
     """
+    cache = LRUCache(cache_size) if cache_size else None
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
             sock.bind(ADDRESS)
@@ -138,21 +352,125 @@ def server():
             while True:
                 # receive user command
                 message, address = sock.recvfrom(BUFFER)
-                message = message.decode()
-                print(f"Request from {address}: {message}")
-                try:
-                    # parse tokens and try to calculate the result
-                    operator, left_operand, right_operand = message.split(' ')
-                    result = calculate_result(operator, left_operand, right_operand)
-                except Exception as e:
-                    # set exception message as the result
-                    result = e.message if hasattr(e, 'message') else "Unresolved exception occurred."
-                print(f"Result: {result}\n")
                 # send the result to client
-                sock.sendto(str(result).encode(), address)
+                sock.sendto(respond(message, address, verbose, cache), address)
     except KeyboardInterrupt:
         print("Keyboard interrupt, server is shutting down.")
+        if cache is not None:
+            print(f"Cache statistics: {cache.stats()}")
+
+
+class CalculatorProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol answering the requests from the event loop instead of the blocking receive loop.
+    """
+
+    def __init__(self, verbose=True, cache=None):
+        super().__init__()
+        self.verbose = verbose
+        self.cache = cache
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        self.transport.sendto(respond(data, address, self.verbose, self.cache), address)
+
+
+async def serve(verbose=True, reuse_port=False, cache=None):
+    """
+    Creates datagram endpoint on the server address and serves it until the task is cancelled.
+
+    :param verbose: whether to print each request and result.
+    :param reuse_port: whether to set SO_REUSEPORT, so that several processes can share the address.
+    :param cache: LRUCache of responses (optional).
+    """
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: CalculatorProtocol(verbose, cache), local_addr=ADDRESS, reuse_port=reuse_port or None)
+    try:
+        await asyncio.Future()
+    finally:
+        transport.close()
+
+
+def run_async_server(verbose=True, reuse_port=False, cache_size=0):
+    # worker function running the event loop, passed as target to Process
+    # each process has its own cache
+    cache = LRUCache(cache_size) if cache_size else None
+    try:
+        asyncio.run(serve(verbose, reuse_port, cache))
+    except KeyboardInterrupt:
+        if cache is not None:
+            print(f"Cache statistics: {cache.stats()}")
+
+
+def async_server(verbose=True, processes=1, cache_size=0):
+    """
+    Asyncio version of the calculator server with the same wire format and error messages.
+    If there are several processes, each of them binds to the same address with SO_REUSEPORT and the kernel
+    distributes the datagrams among them, so that one host can use every core.
+
+    :param verbose: whether to print each request and result.
+    :param processes: number of server processes.
+    :param cache_size: number of cached responses per process (0 - cache is disabled).
+    """
+    print("Waiting for a new request.")
+    if processes == 1:
+        run_async_server(verbose, False, cache_size)
+    else:
+        workers = [Process(target=run_async_server, args=(verbose, True, cache_size)) for _ in range(processes)]
+        [worker.start() for worker in workers]
+        try:
+            [worker.join() for worker in workers]
+        except KeyboardInterrupt:
+            [worker.join() for worker in workers]
+    print("Keyboard interrupt, server is shutting down.")
+
+
+def parse_arguments():
+    """
+    Function used to parse and validate command line arguments.
+    :return: whether to use asyncio server, whether to print each request, number of processes, size of cache.
+    """
+    use_async, verbose, processes, cache_size = False, True, 1, 0
+    for argument in sys.argv[1:]:
+        if argument == '--async':
+            use_async = True
+        elif argument == '--quiet':
+            verbose = False
+        elif argument.startswith('--processes='):
+            try:
+                processes = int(argument.split('=')[1])
+            except ValueError:
+                raise Exception('Number of processes should be numeric.')
+            if processes < 1:
+                raise Exception('Number of processes should be positive.')
+        elif argument.startswith('--cache='):
+            try:
+                cache_size = int(argument.split('=')[1])
+            except ValueError:
+                raise Exception('Size of cache should be numeric.')
+            if cache_size < 0:
+                raise Exception('Size of cache should be non-negative.')
+        else:
+            raise Exception(f'Unknown argument: {argument}')
+    if processes > 1 and not use_async:
+        raise Exception('Several processes are supported only by asyncio server (--async).')
+    return use_async, verbose, processes, cache_size
 
 
 if __name__ == '__main__':
-    server()
+    # parse command line arguments
+    try:
+        use_async, verbose, processes, cache_size = parse_arguments()
+    except Exception as e:
+        print(e)
+        print("Usage example: python server.py [--async] [--quiet] [--processes=<number>] [--cache=<size>]")
+        sys.exit()
+
+    if use_async:
+        async_server(verbose, processes, cache_size)
+    else:
+        server(verbose, cache_size)
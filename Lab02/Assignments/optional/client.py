@@ -15,6 +15,8 @@ SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 65432
 SERVER_ADDRESS = (SERVER_HOST, SERVER_PORT)
 PATH = "images_client/innopolis.jpg"
+# largest packet client is able to send, server chooses the size of packets not greater than this one
+BUFFER = 65507
 
 
 def get_crc_checksum(file_contents):
@@ -35,7 +37,8 @@ def client(path):
     Calculates CRC checksum for an image and puts it in the dictionary. Besides, the dictionary includes fields 'name'
     and 'size'.
     Serialized dictionary transferred to the server.
-    Client waits for the buffer size desired by the server. There was set timeout for receiving data of 1 second.
+    Client proposes the largest size of packet and waits for the buffer size chosen by the server. There was set timeout
+    for receiving data of 1 second.
     The byte sequence of image is splitted in packets of the buffer size.
     Finally, waits for the response from server, whether the data was transferred without errors. If it is not so,
     client resend the image again.
@@ -55,7 +58,8 @@ def client(path):
         file_info = {
             'checksum': checksum,
             'name': name,
-            'size': size
+            'size': size,
+            'buffer': BUFFER
         }
 
         # serialize file information
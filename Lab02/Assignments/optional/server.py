@@ -5,15 +5,25 @@ Email: d.alukaev@innopolis.university
 Group:  B19-DS-01
 """
 
+import os
+import mmap
+import time
 import socket
 import json
 import binascii
-import time
+import ipaddress
 
 HOST = '127.0.0.1'
 PORT = 65432
 ADDRESS = (HOST, PORT)
-BUFFER = 100
+# payload of a datagram that fits in Ethernet frame (1500 bytes without IP and UDP headers)
+PATH_MTU_PAYLOAD = 1472
+# maximal payload of UDP datagram, used on loopback interface
+MAX_PAYLOAD = 65507
+# size of receive buffer of the socket, so that bursts of large datagrams are not dropped
+RECEIVE_BUFFER = 1 << 22
+# time to wait for the next packet of the file
+TIMEOUT = 1
 
 
 def get_crc_checksum(file_contents):
@@ -27,23 +37,171 @@ def get_crc_checksum(file_contents):
     return "%08X" % file_contents
 
 
+def negotiate_buffer(file_info, address):
+    """
+    Chooses the size of packets for the transfer.
+    Loopback clients can use the largest datagram, other clients are limited by path MTU. If client proposed its own
+    limit in the field 'buffer', the smallest of the two is taken.
+
+    :param file_info: dictionary received from client.
+    :param address: address of client.
+    :return: size of packets.
+    """
+    limit = MAX_PAYLOAD if ipaddress.ip_address(address[0]).is_loopback else PATH_MTU_PAYLOAD
+    proposed = file_info.get('buffer')
+    if isinstance(proposed, int) and proposed > 0:
+        return min(proposed, limit)
+    return limit
+
+
+def open_transfer(file_info, address):
+    """
+    Creates state of the transfer: memory-mapped temporary file of the expected size, number of received bytes and
+    running checksum.
+
+    :param file_info: dictionary received from client.
+    :param address: address of client.
+    :return: dictionary with state of the transfer.
+    """
+    name = 'new_' + os.path.basename(file_info['name'])
+    path = 'images_server/' + name
+    size = file_info['size']
+    # temporary file is unique for each client (host and port), so that concurrent uploads of the same file do not collide
+    temporary = f"{path}.{address[0]}.{address[1]}.part"
+    output = open(temporary, 'wb+')
+    mapped, view = None, memoryview(b'')
+    if size > 0:
+        output.truncate(size)
+        mapped = mmap.mmap(output.fileno(), size)
+        view = memoryview(mapped)
+    return {
+        'info': file_info,
+        'path': path,
+        'temporary': temporary,
+        'output': output,
+        'mmap': mapped,
+        'view': view,
+        'received': 0,
+        'crc': 0,
+        'time_reception': time.time(),
+    }
+
+
+def receive_packet(transfer, packet, in_place=False):
+    """
+    Copies the packet into its place of the memory-mapped file and updates the checksum.
+
+    :param transfer: dictionary with state of the transfer.
+    :param packet: memoryview of received packet.
+    :param in_place: whether the packet has been received directly into its place, so that it is not copied.
+    :return: True if the file is received completely, False - otherwise.
+    """
+    view, received = transfer['view'], transfer['received']
+    packet = packet[:len(view) - received]
+    if not in_place:
+        view[received:received + len(packet)] = packet
+    transfer['crc'] = binascii.crc32(packet, transfer['crc'])
+    transfer['received'] += len(packet)
+    transfer['time_reception'] = time.time()
+    return transfer['received'] == len(view)
+
+
+def receive_region(transfer, view):
+    """
+    Chooses where the next datagram is received. Usually the next datagram continues the transfer that received the
+    previous one, so it is received directly into the memory-mapped file at the current offset of that transfer. The
+    region should fit any datagram, otherwise (end of file, no active transfer) the shared buffer is used.
+
+    :param transfer: dictionary with state of the transfer that received the previous datagram, None if there is none.
+    :param view: memoryview of the shared buffer.
+    :return: memoryview the datagram should be received into (to be released by caller), whether it is the
+    memory-mapped file of the transfer.
+    """
+    if transfer is not None and len(transfer['view']) - transfer['received'] >= MAX_PAYLOAD:
+        return transfer['view'][transfer['received']:transfer['received'] + MAX_PAYLOAD], True
+    return view[:], False
+
+
+def close_transfer(sock, address, transfer):
+    """
+    Releases the memory-mapped file, checks whether data is corrupted and informs client about the result.
+
+    :param sock: server socket.
+    :param address: address of client.
+    :param transfer: dictionary with state of the transfer.
+    """
+    transfer['view'].release()
+    if transfer['mmap'] is not None:
+        transfer['mmap'].close()
+    transfer['output'].close()
+
+    checksum = "%08X" % (transfer['crc'] & 0xFFFFFFFF)
+    if transfer['received'] == transfer['info']['size'] and transfer['info']['checksum'] == checksum:
+        # rename received data to new file
+        os.replace(transfer['temporary'], transfer['path'])
+        # inform about successful reception of file
+        sock.sendto("OK".encode(), address)
+        return
+    os.remove(transfer['temporary'])
+    sock.sendto("ERR".encode(), address)
+
+
 def server():
     """
     Server side of UDP application transferring image.
     Receives information about the file to be transferred.
-    Sends size of the buffer for client to transfer byte sequence in portions.
-    Receives file and checks whether the checksum is valid.
+    Negotiates size of the buffer for client to transfer byte sequence in portions.
+    Serves several uploads at once: packets are demultiplexed by address of client into the state of its transfer. Each
+    file is received into memory-mapped temporary file, checksum is validated when the file is received completely.
+    Packet is received directly into the file of the transfer that received the previous packet; packet of another
+    client is copied from there into its own file (the bytes left behind are overwritten by the following packets).
+    Transfer without packets for 1 second is finished with error.
     """
+    transfers = {}
+    packet = bytearray(MAX_PAYLOAD)
+    view = memoryview(packet)
+    # address of client that sent the previous packet
+    last = None
+
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
         sock.bind(ADDRESS)
+        sock.settimeout(TIMEOUT)
         while True:
-            # receive file_info
-            message, address = sock.recvfrom(BUFFER)
+            # finish transfers that are inactive
+            for address in [a for a, t in transfers.items() if time.time() - t['time_reception'] >= TIMEOUT]:
+                print(f"Transfer from {address} is inactive for {TIMEOUT} second(s).")
+                close_transfer(sock, address, transfers.pop(address))
+
+            # region of the memory-mapped file is released before the file might be closed
+            region, mapped = receive_region(transfers.get(last), view)
+            try:
+                size, address = sock.recvfrom_into(region)
+            except socket.timeout:
+                region.release()
+                continue
+            # packet is already in place if it continues the transfer that received the previous packet
+            in_place = mapped and address == last
+            data = region[:size]
+            last = address
+
+            if address in transfers:
+                # data packet of the active transfer
+                complete = receive_packet(transfers[address], data, in_place)
+                data.release()
+                region.release()
+                if complete:
+                    close_transfer(sock, address, transfers.pop(address))
+                continue
+
+            message = bytes(data)
+            data.release()
+            region.release()
             try:
-                # decode message
-                message = message.decode()
-                # convert string representation to dictionary
-                file_info = json.loads(message)
+                # decode message and convert string representation to dictionary
+                file_info = json.loads(message.decode())
+                buffer = negotiate_buffer(file_info, address)
+                transfer = open_transfer(file_info, address)
             except Exception as e:
                 # send exception method
                 response = e.message if hasattr(e, 'message') else "Unresolved exception occurred."
@@ -54,31 +212,11 @@ def server():
             print(f"Received dictionary: {file_info}.")
 
             # send buffer size to client
-            sock.sendto(str(BUFFER).encode(), address)
-
-            # iteratively append packets received from client
-            # resultant byte sequence is the expected image
-            file = b''
-            start = time.time()
-            # repeat until the file is accepted or it took much time since the last reception
-            while len(file) < file_info['size'] and time.time() - start < 1:
-                start = time.time()
-                message, address = sock.recvfrom(BUFFER)
-                file += message
-
-            # check whether data is corrupted
-            if file_info['checksum'] == get_crc_checksum(file):
-                # write received data to new file
-                name = 'new_' + file_info['name']
-                path = 'images_server/' + name
-                with open(path, 'wb+') as output:
-                    output.write(file)
-
-                time.sleep(5)
-                # inform about successful reception of file
-                sock.sendto("OK".encode(), address)
+            sock.sendto(str(buffer).encode(), address)
+            if transfer['info']['size'] == 0:
+                close_transfer(sock, address, transfer)
                 continue
-            sock.sendto("ERR".encode(), address)
+            transfers[address] = transfer
 
 
 if __name__ == '__main__':
@@ -0,0 +1,200 @@
+"""
+Lab-03. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+from emulator import Emulator, HOST
+
+LAB03 = os.path.dirname(os.path.abspath(__file__))
+LAB02 = os.path.join(LAB03, '..', '..', 'Lab02', 'Assignments', 'optional')
+# the server under test and the emulator listen on their own ports, so that they do not interfere with running labs
+SERVER_PORT = 65442
+PROXY_PORT = 65443
+
+# transfer applications under test: directory, directory the server saves files to, options of client
+labs = {
+    'lab02': {'directory': LAB02, 'output': 'images_server', 'options': {}},
+    'lab03': {'directory': LAB03, 'output': 'files_server', 'options': {}},
+}
+# sizes of transferred files in bytes
+SIZES = [1 << 16, 1 << 20, 1 << 23]
+# conditions of the network applied to each direction, see emulator.CONDITIONS
+networks = {
+    'clean': {},
+    'lossy': {'loss': 0.02, 'delay': 0.002, 'jitter': 0.001, 'reorder': 0.01, 'duplicate': 0.01},
+    'bad': {'loss': 0.05, 'delay': 0.01, 'jitter': 0.005, 'reorder': 0.05, 'duplicate': 0.02},
+}
+# probability of losing message in each direction, used for comparison of forward error correction
+LOSS_RATES = [0.01, 0.02, 0.05, 0.1]
+# number of data segments protected by one parity segment, 0 - plain retransmission
+FEC_BLOCKS = [0, 4, 8, 16]
+# each configuration is measured several times and the median is taken
+REPEATS = 3
+# transfer that is not completed within this number of seconds is considered failed
+TIMEOUT = 30
+
+# program of the server: the server of the lab is started on the port of the benchmark
+SERVER_PROGRAM = '''
+import server
+server.ADDRESS = ({host!r}, {port})
+server.server()
+'''
+# program of the client: the client of the lab sends file to the emulator, prints runtime and its statistics
+CLIENT_PROGRAM = '''
+import json, time, client
+client.SERVER_ADDRESS = ({host!r}, {port})
+start = time.perf_counter()
+stats = client.client({path!r}, **{options!r})
+print(json.dumps({{'elapsed': time.perf_counter() - start, 'stats': stats}}))
+'''
+
+
+def start_server(lab):
+    # starts the server of the lab in a separate process
+    program = SERVER_PROGRAM.format(host=HOST, port=SERVER_PORT)
+    process = subprocess.Popen([sys.executable, '-c', program], cwd=labs[lab]['directory'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # give the server time to bind the socket
+    time.sleep(0.5)
+    return process
+
+
+def transfer(lab, path, network, **options):
+    """
+    Transfers the file by the client of the lab through the emulator.
+
+    :param lab: name of the lab.
+    :param path: path to the file to be transferred.
+    :param network: dictionary with conditions of the network.
+    :param options: keyword arguments of the client.
+    :return: dictionary with completion time, goodput, overhead and retransmission ratio; None if transfer failed.
+    """
+    size = os.path.getsize(path)
+    program = CLIENT_PROGRAM.format(host=HOST, port=PROXY_PORT, path=os.path.abspath(path),
+                                    options=dict(labs[lab]['options'], **options))
+    with Emulator((HOST, PROXY_PORT), (HOST, SERVER_PORT), **network) as emulator:
+        try:
+            completed = subprocess.run([sys.executable, '-c', program], cwd=labs[lab]['directory'],
+                                       capture_output=True, text=True, timeout=TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return None
+    lines = completed.stdout.splitlines()
+    if completed.returncode or not lines:
+        return None
+    result = json.loads(lines[-1])
+    stats = result['stats']
+    # client of Lab02 returns nothing, it reports the response of the server instead
+    if stats is None and "Server response: OK" not in completed.stdout:
+        return None
+    return {
+        'time': result['elapsed'],
+        'goodput': size / result['elapsed'],
+        # bytes sent by the client beyond the size of file (headers, control messages and retransmissions) per byte
+        'overhead': emulator.stats['upstream_bytes'] / max(size, 1) - 1,
+        'retransmission_ratio': stats['retransmitted'] / max(stats['sent'], 1) if stats else None,
+    }
+
+
+def summarize(runs):
+    # median of each measure over successful transfers
+    runs = [run for run in runs if run is not None]
+    if not runs:
+        return None
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = statistics.median(values) if values else None
+    return summary
+
+
+def measure(lab, path, network, **options):
+    """
+    Starts the server of the lab and transfers the file several times. Files saved by the server during the
+    measurement are removed afterwards.
+
+    :param lab: name of the lab.
+    :param path: path to the file to be transferred.
+    :param network: dictionary with conditions of the network.
+    :param options: keyword arguments of the client.
+    :return: median measures (None if every transfer failed), number of failed transfers.
+    """
+    output = os.path.join(labs[lab]['directory'], labs[lab]['output'])
+    existing = set(os.listdir(output))
+    server = start_server(lab)
+    try:
+        runs = [transfer(lab, path, network, **options) for _ in range(REPEATS)]
+    finally:
+        server.terminate()
+        server.wait()
+        for name in set(os.listdir(output)) - existing:
+            target = os.path.join(output, name)
+            shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+    return summarize(runs), runs.count(None)
+
+
+def describe(summary, failed):
+    # line describing the measures
+    if summary is None:
+        return "every transfer failed."
+    ratio = summary['retransmission_ratio']
+    ratio = f", retransmission ratio: {ratio:.1%}" if ratio is not None else ''
+    return f"{summary['time'] * 1000:.1f} ms, goodput: {summary['goodput'] / 1024:.1f} KiB/s, " \
+           f"overhead: {summary['overhead']:.1%}{ratio}, failed: {failed}."
+
+
+def sweep(selected):
+    """
+    Measures transfer of files of each size under each condition of the network by each selected lab.
+
+    :param selected: list of names of labs.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        for size in SIZES:
+            path = os.path.join(directory, f"file_{size}.bin")
+            with open(path, 'wb') as file:
+                file.write(os.urandom(size))
+            for lab in selected:
+                for network in networks:
+                    summary, failed = measure(lab, path, networks[network])
+                    print(f"{lab}, {size} bytes, {network} network: {describe(summary, failed)}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def compare_fec(path):
+    """
+    Prints measures of each mode of forward error correction of Lab03 under each loss rate.
+
+    :param path: path to the file to be transferred.
+    """
+    for loss in LOSS_RATES:
+        print(f"Loss rate {loss:.0%}:")
+        for fec in FEC_BLOCKS:
+            summary, failed = measure('lab03', path, {'loss': loss}, fec=fec)
+            print(f"  {'FEC ' + str(fec) if fec else 'retransmission'}: {describe(summary, failed)}")
+
+
+if __name__ == "__main__":
+    # parse command line arguments
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in ('sweep', 'fec') or \
+            sys.argv[1] == 'sweep' and len(sys.argv) == 3 and sys.argv[2] not in labs:
+        print("Usage example: python benchmark.py sweep [lab02|lab03]")
+        print("               python benchmark.py fec [path]")
+        sys.exit()
+
+    if sys.argv[1] == 'fec':
+        compare_fec(sys.argv[2] if len(sys.argv) == 3 else os.path.join(LAB03, 'files_client', 'innopolis.jpg'))
+    else:
+        sweep(sys.argv[2:] or list(labs))
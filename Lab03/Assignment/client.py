@@ -5,118 +5,405 @@ Email: d.alukaev@innopolis.university
 Group:  B19-DS-01
 """
 
-import socket
 import os
+import sys
+import mmap
+import time
+import random
+import socket
+import hashlib
+from threading import Thread
+
+from fec import parity
+from protocol import HEADER, START, START_ACK, DATA, ACK, PARITY, STRIPE, RESUME, FEC, START_PAYLOAD, STRIPE_PAYLOAD, \
+    RESUME_PAYLOAD, FEC_PAYLOAD, START_ACK_PAYLOAD, RESUME_ACK_PAYLOAD, FEC_ACK_PAYLOAD, MalformedMessageError, pack, \
+    unpack
 
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 65432
 SERVER_ADDRESS = (SERVER_HOST, SERVER_PORT)
 PATH = "files_client/innopolis.jpg"
+# size of buffer for responses of the server
+BUFFER = 64
+# number of segments that can be sent without acknowledgement, 1 - stop-and-wait
+WINDOW = 16
+# time to wait for acknowledgement before the first RTT sample is obtained
+TIMEOUT = 0.5
+# bounds of the retransmission timeout
+MIN_RTO = 0.005
+MAX_RTO = 4
+# gains of smoothed RTT and RTT variation (Jacobson/Karels)
+ALPHA = 1 / 8
+BETA = 1 / 4
+# congestion window at the start of the session (in segments)
+INITIAL_WINDOW = 2
+# number of transmissions of the start message before the server is considered unavailable
+ATTEMPTS = 5
+# number of transmissions of a data segment before the server is considered unavailable
+SEGMENT_ATTEMPTS = 8
+# number of times the transfer is resumed after the server stopped responding
+RESUME_ATTEMPTS = 3
+# number of data segments protected by one parity segment, 0 - forward error correction is disabled
+FEC_BLOCK = 0
+
+
+class CongestionControl:
+    """
+    Class estimating retransmission timeout from RTT samples (Jacobson/Karels) with exponential backoff on timeouts,
+    and congestion window governed by AIMD: window grows by one segment per acknowledgement below the slow start
+    threshold, by one segment per window above it, and is halved on loss.
+    Collects statistics of the session.
+    """
+
+    def __init__(self, max_window=1):
+        # window negotiated with the server
+        self.max_window = max_window
+        self.srtt = None
+        self.rttvar = None
+        self.rto = TIMEOUT
+        self.cwnd = min(INITIAL_WINDOW, max_window)
+        self.ssthresh = max_window
+        # time of the last decrease of window, window is decreased at most once per flight of segments
+        self.recovery = 0
+        self.start = time.time()
+        self.stats = {'sent': 0, 'retransmitted': 0, 'timeouts': 0, 'parity': 0, 'acked_bytes': 0}
+
+    def window(self):
+        # number of segments allowed to be in flight
+        return max(1, min(int(self.cwnd), self.max_window))
+
+    def on_send(self, retransmission=False):
+        self.stats['sent'] += 1
+        if retransmission:
+            self.stats['retransmitted'] += 1
+
+    def on_rtt_sample(self, rtt):
+        """
+        Updates smoothed RTT, RTT variation and retransmission timeout.
+        Only segments transmitted once are sampled (Karn's algorithm).
+
+        :param rtt: time between transmission of segment and its acknowledgement.
+        """
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+        self.rto = min(max(self.srtt + 4 * self.rttvar, MIN_RTO), MAX_RTO)
+
+    def on_ack(self, size):
+        """
+        Additive increase of congestion window, the window does not exceed the one negotiated with the server.
+
+        :param size: number of acknowledged data bytes.
+        """
+        self.stats['acked_bytes'] += size
+        if self.cwnd < self.ssthresh:
+            self.cwnd = min(self.cwnd + 1, self.max_window)
+        else:
+            self.cwnd = min(self.cwnd + 1 / self.cwnd, self.max_window)
+
+    def on_timeout(self, sent):
+        """
+        Exponential backoff of retransmission timeout and multiplicative decrease of congestion window.
+
+        :param sent: time of transmission of the lost segment.
+        """
+        self.stats['timeouts'] += 1
+        self.rto = min(self.rto * 2, MAX_RTO)
+        # segments sent before the last decrease belong to the same loss event
+        if sent >= self.recovery:
+            self.ssthresh = max(self.cwnd / 2, 1)
+            self.cwnd = self.ssthresh
+            self.recovery = time.time()
+
+    def summary(self):
+        # statistics of the session: counters, current estimates and goodput (acknowledged bytes per second)
+        elapsed = time.time() - self.start
+        return dict(self.stats, elapsed=elapsed, goodput=self.stats['acked_bytes'] / elapsed if elapsed else 0,
+                    srtt=self.srtt, rto=self.rto, cwnd=self.cwnd)
+
+
+def handshake(sock, transfer, extension, size, window, stripe=None, digest=None, fec=0):
+    """
+    Initialize connection by sending start message containing size of file to be transferred, proposed size of window
+    and extension. To do so there are allowed 5 attempts.
+
+    :param sock: client socket.
+    :param transfer: identifier of transfer.
+    :param extension: extension of file.
+    :param size: size of file (or of range) in bytes.
+    :param window: proposed size of window.
+    :param stripe: description of range packed by STRIPE_PAYLOAD if the file is transferred by several sessions.
+    :param digest: SHA-256 digest of file if the transfer can be resumed.
+    :param fec: proposed number of data segments protected by one parity segment, 0 - no forward error correction.
+    :return: sequence number of the first data segment to be sent, maximal size of message, negotiated window, offset to
+    resume from, negotiated number of segments in block; None if server is not available.
+    """
+    payload = START_PAYLOAD.pack(size, window) + (stripe or b'')
+    if digest:
+        payload += RESUME_PAYLOAD.pack(digest)
+    if fec:
+        payload += FEC_PAYLOAD.pack(min(fec, 255))
+    flags = (STRIPE if stripe else 0) | (RESUME if digest else 0) | (FEC if fec else 0)
+    start_message = pack(START, transfer, 0, 0, payload + extension.encode(), flags)
+
+    # wait for response on start message until program made 5 attempts
+    for _ in range(ATTEMPTS):
+        sock.sendto(start_message, SERVER_ADDRESS)
+        try:
+            # receive response from server
+            response, address = sock.recvfrom(BUFFER)
+            kind, flags, identifier, _, ack, payload = unpack(response)
+        except (socket.timeout, MalformedMessageError):
+            continue
+
+        # acceptable response is only ack of start message of this transfer
+        if kind != START_ACK or identifier != transfer:
+            continue
+        maxsize, negotiated = START_ACK_PAYLOAD.unpack_from(payload)
+        position = START_ACK_PAYLOAD.size
+        offset, block = 0, 0
+        if flags & RESUME:
+            offset, = RESUME_ACK_PAYLOAD.unpack_from(payload, position)
+            position += RESUME_ACK_PAYLOAD.size
+        if flags & FEC:
+            block, = FEC_ACK_PAYLOAD.unpack_from(payload, position)
+        return ack, maxsize, negotiated, offset, block
+    return None
+
 
+def send_windowed(sock, data, transfer, first, maxsize, control, fec=0):
+    """
+    Selective-repeat transfer: up to window segments are in flight at once, window of one segment is stop-and-wait.
+    Segment i is sent with sequence number first + i. The server acknowledges each segment by message with the next
+    expected sequence number as acknowledgement number and sequence number of received segment, so that the client
+    knows both the contiguous prefix received by the server and the segments received out of order.
+    Each segment has its own retransmission timer; only expired segments are retransmitted. Number of segments in
+    flight is limited by the congestion window, timers use the adaptive retransmission timeout.
+    With forward error correction, parity of every block of fec segments is sent right after the last segment of block
+    is sent for the first time, so that the server can reconstruct one lost segment of block without retransmission.
 
-def client(path):
+    :param sock: client socket.
+    :param data: byte sequence of the file.
+    :param transfer: identifier of transfer.
+    :param first: sequence number of the first data segment.
+    :param maxsize: maximal size of message.
+    :param control: CongestionControl of the session.
+    :param fec: number of data segments in block protected by parity segment, 0 - no forward error correction.
+    :return: True if file is transferred, False - otherwise.
+    """
+    # header has the same size for every message, so every segment carries the same number of data bytes
+    segment_size = maxsize - HEADER.size
+    segments = [data[idx:idx + segment_size] for idx in range(0, len(data), segment_size)]
+
+    # index of the first not acknowledged segment and of the next segment to be sent for the first time
+    base, next_idx = 0, 0
+    acked = set()
+    # index of segment in flight -> [time of last transmission, number of transmissions]
+    in_flight = {}
+
+    def transmit(idx, retransmission=False):
+        # timer is started before sending, so that RTT sample includes the time spent in sendto
+        timer = in_flight.setdefault(idx, [0, 0])
+        timer[0], timer[1] = time.time(), timer[1] + 1
+        sock.sendto(pack(DATA, transfer, first + idx, 0, segments[idx]), SERVER_ADDRESS)
+        control.on_send(retransmission)
+
+    def acknowledge(idx):
+        timer = in_flight.pop(idx, None)
+        if timer is None:
+            return
+        if timer[1] == 1:
+            control.on_rtt_sample(time.time() - timer[0])
+        control.on_ack(len(segments[idx]))
+
+    while base < len(segments):
+        # fill the congestion window, segments beyond the negotiated window would not be accepted by the server
+        while next_idx < min(len(segments), base + control.max_window) and len(in_flight) < control.window():
+            transmit(next_idx)
+            next_idx += 1
+            if fec and (next_idx % fec == 0 or next_idx == len(segments)):
+                # block is sent, parity message carries the first segment of block and number of segments in it
+                start = (next_idx - 1) // fec * fec
+                block = parity(segments[start:next_idx])
+                sock.sendto(pack(PARITY, transfer, first + start, next_idx - start, block), SERVER_ADDRESS)
+                control.stats['parity'] += 1
+
+        # wait for acknowledgement not longer than until the earliest timer expires
+        deadline = min(sent for sent, _ in in_flight.values()) + control.rto
+        sock.settimeout(max(deadline - time.time(), 0.001))
+        try:
+            response, address = sock.recvfrom(BUFFER)
+            kind, _, identifier, seq, ack, _ = unpack(response)
+            if kind == ACK and identifier == transfer:
+                cumulative, selective = ack - first, seq - first
+                if selective >= base:
+                    acked.add(selective)
+                acknowledge(selective)
+                # every segment before the next expected one is received
+                for idx in range(base, cumulative):
+                    acked.add(idx)
+                    acknowledge(idx)
+                # slide the window
+                while base in acked:
+                    acked.discard(base)
+                    base += 1
+        except (socket.timeout, MalformedMessageError):
+            pass
+
+        # retransmit segments with expired timers, timeout is backed off once for all of them
+        now = time.time()
+        expired = [idx for idx, timer in in_flight.items() if now - timer[0] >= control.rto]
+        if not expired:
+            continue
+        control.on_timeout(min(in_flight[idx][0] for idx in expired))
+        for idx in expired:
+            if in_flight[idx][1] == SEGMENT_ATTEMPTS:
+                return False
+            transmit(idx, True)
+    return True
+
+
+def client(path, window=WINDOW, fec=FEC_BLOCK, resume=True):
     """
     Client side of UDP application transferring image.
     Opens image with specified path in binary mode and reads the content.
-    Initialize connection by sending start message containing descriptor 's', sequence number, extension and size of
-    file to be transferred. To do so there are allowed 5 attempts. Otherwise, the program finishes.
-    The byte sequence of image is splitted in packets of the buffer size. Each packet is sent to the server until each
-    packet arrival is acknowledged. The data message contains descriptor 'd' and data bytes. The timeout is set to 0.5
-    seconds, failing which starts retransmission of file.
+    Initialize connection by sending start message containing extension, size and content hash of file to be
+    transferred and proposed size of window. To do so there are allowed 5 attempts. Otherwise, the program finishes.
+    The byte sequence of image is splitted in packets of the buffer size. Segments are sent by sliding window with
+    selective acknowledgements (window of one segment is stop-and-wait). Every message has the fixed binary header
+    described in protocol.py. The timeout is set to 0.5 seconds until the first RTT sample, then retransmission timeout
+    adapts to the measured RTT.
+    Transfer is resumable: the server responds with offset such that all the preceding bytes are already received
+    (possibly by the previous run of client), only the following bytes are sent. If the server stops responding, the
+    transfer is resumed by a new start message up to 3 times.
+    Optionally, every block of segments is followed by parity segment (forward error correction), so that a single
+    lost segment of block is reconstructed by the server without retransmission.
 
     :param path: path to the file to be transferred.
+    :param window: number of segments that can be sent without acknowledgement.
+    :param fec: proposed number of data segments protected by one parity segment, 0 - no forward error correction.
+    :param resume: whether transfer can be resumed, otherwise the file is always sent from the beginning.
+    :return: statistics of the session (None if server is not available).
     """
     # open image in binary mode and read the content
     with open(path, 'rb') as image:
         data = image.read()
 
-        # take the name and extract an extension
-        _, name = os.path.split(path)
-        extension = name.split('.')[1]
-        # it is conventional to have size of file in Bytes
-        size = os.path.getsize(path)
+    # take the name and extract an extension
+    _, name = os.path.split(path)
+    extension = name.split('.')[-1]
+    # it is conventional to have size of file in Bytes
+    size = len(data)
+    # content hash identifies the transfer to be resumed
+    digest = hashlib.sha256(data).digest() if resume else None
+    transfer = random.getrandbits(32)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        control = None
+        for _ in range(RESUME_ATTEMPTS + 1):
+            sock.settimeout(TIMEOUT)
+            negotiation = handshake(sock, transfer, extension, size, window, digest=digest, fec=fec)
+            if negotiation is None:
+                break
+            first, maxsize, negotiated, offset, block = negotiation
+            if offset:
+                print(f"Transfer is resumed from byte {offset}.")
+
+            if control is None:
+                control = CongestionControl(negotiated)
+            if send_windowed(sock, memoryview(data)[offset:], transfer, first, maxsize, control, block):
+                stats = control.summary()
+                print("File was successfully sent!")
+                print(f"Goodput: {stats['goodput'] / 1024:.1f} KiB/s, sent: {stats['sent']}, "
+                      f"retransmitted: {stats['retransmitted']}, smoothed RTT: {stats['srtt']}.")
+                return stats
+        print("Server is not available.")
+
 
+def send_stripe(path, extension, transfer, index, streams, low, high, window, fec, results):
+    """
+    Worker function passed as target to Thread.
+    Transfers range [low, high) of file by its own session: own socket, sequence numbers and congestion control.
+    The file is memory-mapped, so segments are slices of the mapping rather than copies of the file.
+
+    :param path: path to the file to be transferred.
+    :param extension: extension of file.
+    :param transfer: identifier of transfer.
+    :param index: index of range.
+    :param streams: number of ranges.
+    :param low: offset of range.
+    :param high: offset following the range.
+    :param window: number of segments that can be sent without acknowledgement.
+    :param fec: proposed number of data segments protected by one parity segment.
+    :param results: list to which statistics of session are written at index of range (None if transfer failed).
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        data = memoryview(mapping)[low:high]
+        stripe = STRIPE_PAYLOAD.pack(index, streams, low, len(mapping))
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-            sock.settimeout(0.5)
-            # initiate sequence number
-            seqnum = 0
-
-            # initiate number of attempts made
-            ATTEMPTS = 0
-            # wait for response on start message until program made 5 attempts
-            while ATTEMPTS < 5:
-                ATTEMPTS += 1
-                # compose and send the start message
-                start_message = f"s|{seqnum}|{extension}|{size}"
-                sock.sendto(start_message.encode(), SERVER_ADDRESS)
-
-                try:
-                    # receive response from server
-                    response, address = sock.recvfrom(100)
-                    response = response.decode().split('|')
-
-                    # acceptable response is only ack
-                    if response[0] != 'a':
-                        continue
-
-                    # set maximal size of message
-                    maxsize = int(response[2])
-                    # update sequence number
-                    seqnum = int(response[1])
-                    break
-                except:
-                    continue
-
-            if ATTEMPTS == 5:
-                print("Server is not available. ")
-                return
-
-            # increment sequence number
-            seqnum += 1
-            # to transfer each packet there is quota of 5 attempts
-            ATTEMPTS = 0
-            # index of byte from which will start next message
-            last_idx = 0
-            while last_idx < len(data) and ATTEMPTS < 5:
-                # send until whole byte sequence is not transferred or number attempts is greater than 5
-
-                ATTEMPTS += 1
-                # encode string part of the message
-                data_message = f"d|{seqnum}|".encode()
-                # number of data bytes that are to be transferred
-                bytes_left = len(data[last_idx:])
-                # number of bytes that are reserved for separators, descriptor ('s'/'d') and sequence number
-                aux_bytes = len(data_message)
-                # segment size is either the number of left data bytes or number of bytes left in the message
-                segment_size = min(maxsize - aux_bytes, bytes_left)
-                # segment
-                segment = data[last_idx: last_idx + segment_size]
-                # compose data message
-                data_message += segment
-                # send data message
-                sock.sendto(data_message, SERVER_ADDRESS)
-                try:
-                    # receive response from server
-                    response, address = sock.recvfrom(100)
-                    response = response.decode().split('|')
-
-                    # acceptable response is only ack
-                    if response[0] != 'a':
-                        continue
-
-                    # update last index to index of next byte
-                    last_idx += segment_size
-                    # increment sequence number
-                    seqnum = int(response[1]) + 1
-                    # reset number of attempts
-                    ATTEMPTS = 0
-                except:
-                    continue
-            if ATTEMPTS == 5:
-                print("Server is not available.")
-                return
-            print("File was successfully sent!")
+            sock.settimeout(TIMEOUT)
+            negotiation = handshake(sock, transfer, extension, high - low, window, stripe, fec=fec)
+            if negotiation is not None:
+                first, maxsize, window, _, block = negotiation
+                control = CongestionControl(window)
+                if send_windowed(sock, data, transfer, first, maxsize, control, block):
+                    results[index] = control.summary()
+            # views of the mapping should be released before it is closed
+            data.release()
+
+
+def client_striped(path, streams, window=WINDOW, fec=FEC_BLOCK):
+    """
+    Striped transfer: file is splitted into contiguous ranges, each of them is transferred concurrently by its own
+    session in a separate thread. Sessions are tied by identifier of transfer, the server writes ranges to their
+    positions of the same output file.
+
+    :param path: path to the file to be transferred.
+    :param streams: number of concurrent sessions.
+    :param window: number of segments that can be sent without acknowledgement (per session).
+    :param fec: proposed number of data segments protected by one parity segment.
+    :return: list of statistics of sessions (None if server is not available).
+    """
+    _, name = os.path.split(path)
+    extension = name.split('.')[-1]
+    size = os.path.getsize(path)
+    if size == 0:
+        # empty file cannot be memory-mapped, there is nothing to stripe
+        return client(path, window, fec)
+    # ranges are of equal size, the last one might be shorter
+    step = -(-size // streams)
+    ranges = [(low, min(low + step, size)) for low in range(0, size, step)]
+    transfer = random.getrandbits(32)
+
+    start = time.time()
+    results = [None] * len(ranges)
+    threads = [Thread(target=send_stripe, args=(path, extension, transfer, index, len(ranges), low, high, window, fec,
+                                                results))
+               for index, (low, high) in enumerate(ranges)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    elapsed = time.time() - start
+
+    if None in results:
+        print("Server is not available.")
+        return
+    print("File was successfully sent!")
+    print(f"Goodput: {size / elapsed / 1024:.1f} KiB/s over {len(threads)} sessions, "
+          f"sent: {sum(stats['sent'] for stats in results)}, "
+          f"retransmitted: {sum(stats['retransmitted'] for stats in results)}.")
+    return results
 
 
 if __name__ == "__main__":
-    client(PATH)
+    # optional command line arguments: number of concurrent sessions, number of segments protected by parity segment
+    if len(sys.argv) > 3 or not all(argument.isdigit() for argument in sys.argv[1:]):
+        print("Usage example: python client.py [streams] [fec]")
+        sys.exit()
+    streams = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    fec = int(sys.argv[2]) if len(sys.argv) > 2 else FEC_BLOCK
+    if streams > 1:
+        client_striped(PATH, streams, fec=fec)
+    else:
+        client(PATH, fec=fec)
@@ -0,0 +1,201 @@
+"""
+Lab-03. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import sys
+import time
+import heapq
+import random
+import socket
+import selectors
+from threading import Thread, Event
+
+HOST = '127.0.0.1'
+# the proxy listens on this port and forwards messages to the server
+LISTEN_PORT = 65433
+TARGET_PORT = 65432
+BUFFER = 65507
+
+# default conditions of the emulated network, applied to each direction independently
+CONDITIONS = {
+    # probability of losing message
+    'loss': 0,
+    # one-way delay and its maximal deviation, in seconds
+    'delay': 0,
+    'jitter': 0,
+    # probability of holding message back, so that the following messages overtake it
+    'reorder': 0,
+    # probability of delivering message twice
+    'duplicate': 0,
+}
+# additional delay of the message that is reordered, in seconds
+REORDER_DELAY = 0.005
+
+
+class Emulator:
+    """
+    Class of UDP proxy emulating adverse network between clients and the server on localhost. Messages of clients are
+    received on the listening address and forwarded to the server from a separate socket per client, so that the
+    server sees every client as a distinct address and its responses are forwarded back to the right client.
+    Each message independently is lost, delayed (delay with uniform jitter), reordered or duplicated. Delayed messages
+    are kept in a heap ordered by time of delivery.
+    Collects statistics: number of messages and bytes received from clients and from the server, number of lost,
+    duplicated and reordered messages.
+    """
+
+    def __init__(self, listen=(HOST, LISTEN_PORT), target=(HOST, TARGET_PORT), seed=0, **conditions):
+        unknown = set(conditions) - set(CONDITIONS)
+        if unknown:
+            raise Exception(f"Unknown conditions: {', '.join(sorted(unknown))}.")
+        self.listen = listen
+        self.target = target
+        self.conditions = dict(CONDITIONS, **conditions)
+        self.random = random.Random(seed)
+        self.stats = {'upstream': 0, 'upstream_bytes': 0, 'downstream': 0, 'downstream_bytes': 0, 'lost': 0,
+                      'duplicated': 0, 'reordered': 0}
+        self.stop_event = Event()
+        self.ready = Event()
+        self.thread = None
+
+    def schedule(self, pending, counter, sock, message, destination):
+        """
+        Applies conditions of the network to the message and schedules its delivery.
+
+        :param pending: heap of messages to be delivered.
+        :param counter: iterator giving unique numbers, so that messages with the same time are not compared.
+        :param sock: socket the message should be sent from.
+        :param message: bytes of message.
+        :param destination: address the message should be sent to.
+        """
+        conditions = self.conditions
+        if self.random.random() < conditions['loss']:
+            self.stats['lost'] += 1
+            return
+        copies = 1
+        if self.random.random() < conditions['duplicate']:
+            self.stats['duplicated'] += 1
+            copies = 2
+        now = time.time()
+        for _ in range(copies):
+            delay = max(conditions['delay'] + self.random.uniform(-conditions['jitter'], conditions['jitter']), 0)
+            if self.random.random() < conditions['reorder']:
+                self.stats['reordered'] += 1
+                delay += REORDER_DELAY
+            heapq.heappush(pending, (now + delay, next(counter), sock, message, destination))
+
+    def run(self):
+        # main loop of the proxy, executed in a separate thread
+        selector = selectors.DefaultSelector()
+        # address of client -> socket forwarding its messages to the server
+        upstream = {}
+        pending = []
+        counter = iter(range(1 << 62))
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        listener.bind(self.listen)
+        selector.register(listener, selectors.EVENT_READ, None)
+        self.ready.set()
+        try:
+            while not self.stop_event.is_set():
+                timeout = min(max(pending[0][0] - time.time(), 0), 0.1) if pending else 0.1
+                for key, _ in selector.select(timeout):
+                    sock, client = key.fileobj, key.data
+                    try:
+                        message, address = sock.recvfrom(BUFFER)
+                    except OSError:
+                        continue
+                    if client is None:
+                        # message of client is forwarded to the server
+                        if address not in upstream:
+                            forward = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                            selector.register(forward, selectors.EVENT_READ, address)
+                            upstream[address] = forward
+                        self.stats['upstream'] += 1
+                        self.stats['upstream_bytes'] += len(message)
+                        self.schedule(pending, counter, upstream[address], message, self.target)
+                    else:
+                        # response of the server is forwarded to the client
+                        self.stats['downstream'] += 1
+                        self.stats['downstream_bytes'] += len(message)
+                        self.schedule(pending, counter, listener, message, client)
+
+                # deliver messages whose time has come
+                now = time.time()
+                while pending and pending[0][0] <= now:
+                    _, _, sock, message, destination = heapq.heappop(pending)
+                    sock.sendto(message, destination)
+        finally:
+            selector.close()
+            listener.close()
+            [sock.close() for sock in upstream.values()]
+
+    def start(self):
+        # starts the proxy in a separate thread and waits until it listens
+        self.stop_event.clear()
+        self.ready.clear()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def parse_arguments():
+    """
+    Function used to parse and validate command line arguments of the form --name=value.
+    :return: listening port, port of the server, dictionary with conditions of the network.
+    """
+    listen, target, conditions = LISTEN_PORT, TARGET_PORT, {}
+    for argument in sys.argv[1:]:
+        if '=' not in argument:
+            raise Exception(f'Unknown argument: {argument}')
+        name, value = argument.split('=', 1)
+        name = name.lstrip('-')
+        try:
+            if name == 'listen':
+                listen = int(value)
+            elif name == 'target':
+                target = int(value)
+            elif name in CONDITIONS:
+                conditions[name] = float(value)
+            else:
+                raise Exception(f'Unknown argument: {argument}')
+        except ValueError:
+            raise Exception(f'Wrong value of argument: {argument}')
+    if any(value < 0 for value in conditions.values()):
+        raise Exception('Conditions of the network should be non-negative.')
+    return listen, target, conditions
+
+
+if __name__ == '__main__':
+    # parse command line arguments
+    try:
+        listen, target, conditions = parse_arguments()
+    except Exception as e:
+        print(e)
+        print("Usage example: python emulator.py [--listen=65433] [--target=65432] [--loss=0.05] [--delay=0.01] "
+              "[--jitter=0.005] [--reorder=0.01] [--duplicate=0.01]")
+        sys.exit()
+
+    emulator = Emulator((HOST, listen), (HOST, target), **conditions).start()
+    print(f"Forwarding {HOST}:{listen} -> {HOST}:{target} with {emulator.conditions}.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
+        print(f"Statistics: {emulator.stats}")
@@ -0,0 +1,83 @@
+"""
+Lab-03. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+# Forward error correction by XOR parity: block of k data segments is followed by one parity segment, which is XOR of
+# the segments of block (shorter segment is padded with zeros). Any single lost segment of block is XOR of the parity
+# and the other segments. Segments are XORed as little-endian integers, so that padding is implicit and XOR of a whole
+# segment is a single operation.
+
+
+def parity(segments):
+    """
+    Computes parity segment of the block.
+
+    :param segments: list of data segments of block.
+    :return: bytes of parity segment, its length is the length of the longest segment.
+    """
+    value = 0
+    for segment in segments:
+        value ^= int.from_bytes(segment, 'little')
+    return value.to_bytes(max(len(segment) for segment in segments), 'little')
+
+
+def block_of(blocks, start, size):
+    # state of block: XOR of received segments, their sequence numbers and parity (None until it is received)
+    if start not in blocks:
+        blocks[start] = {'size': size, 'xor': 0, 'seen': set(), 'parity': None}
+    return blocks[start]
+
+
+def recover(blocks, start):
+    """
+    Reconstructs the only missing segment of block if its parity is received. Block is forgotten after that.
+
+    :param blocks: dictionary of blocks, sequence number of the first segment of block -> state of block.
+    :param start: sequence number of the first segment of block.
+    :return: sequence number and value (as integer) of the missing segment; None if it cannot be reconstructed yet.
+    """
+    block = blocks[start]
+    if block['parity'] is None or len(block['seen']) != block['size'] - 1:
+        return None
+    blocks.pop(start)
+    missing = next(seq for seq in range(start, start + block['size']) if seq not in block['seen'])
+    return missing, block['parity'] ^ block['xor']
+
+
+def add_segment(blocks, start, size, seq, data):
+    """
+    Accounts received data segment in its block.
+
+    :param blocks: dictionary of blocks.
+    :param start: sequence number of the first segment of block.
+    :param size: number of segments in block.
+    :param seq: sequence number of segment.
+    :param data: bytes or memoryview of segment.
+    :return: reconstructed segment (see recover) or None.
+    """
+    block = block_of(blocks, start, size)
+    block['seen'].add(seq)
+    block['xor'] ^= int.from_bytes(data, 'little')
+    if len(block['seen']) == size:
+        # every segment is received, parity is not needed
+        blocks.pop(start)
+        return None
+    return recover(blocks, start)
+
+
+def add_parity(blocks, start, size, data):
+    """
+    Accounts received parity segment of block.
+
+    :param blocks: dictionary of blocks.
+    :param start: sequence number of the first segment of block.
+    :param size: number of segments in block.
+    :param data: bytes or memoryview of parity segment.
+    :return: reconstructed segment (see recover) or None.
+    """
+    block = block_of(blocks, start, size)
+    block['parity'] = int.from_bytes(data, 'little')
+    return recover(blocks, start)
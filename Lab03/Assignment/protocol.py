@@ -0,0 +1,90 @@
+"""
+Lab-03. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import struct
+import zlib
+
+VERSION = 2
+
+# types of messages
+START = 1
+START_ACK = 2
+DATA = 3
+ACK = 4
+PARITY = 5
+
+# flags of start message
+# file is transferred by several concurrent sessions, each of them carries a range of file
+STRIPE = 1
+# transfer can be resumed: start message carries content hash of file, response carries offset to resume from
+RESUME = 2
+# forward error correction: after every block of data segments the client sends parity segment of the block
+FEC = 4
+
+# fixed header of every message: version, type, flags, identifier of transfer, sequence number, acknowledgement number,
+# length of payload, CRC32 checksum of payload
+HEADER = struct.Struct('!BBBxIIIHI')
+# payload of start message: size of file (of range in striped transfer), proposed size of window (followed by extension
+# of file)
+START_PAYLOAD = struct.Struct('!QH')
+# description of range in striped transfer (follows payload of start message, precedes extension): index of range,
+# number of ranges, offset of range, size of file
+STRIPE_PAYLOAD = struct.Struct('!HHQQ')
+# content hash of file in resumable transfer (follows description of range, precedes extension): SHA-256 digest
+RESUME_PAYLOAD = struct.Struct('!32s')
+# number of data segments in block protected by parity segment (follows content hash, precedes extension)
+FEC_PAYLOAD = struct.Struct('!B')
+# payload of response to start message: maximal size of message, negotiated size of window
+START_ACK_PAYLOAD = struct.Struct('!HH')
+# offset to resume from (follows payload of response to start message of resumable transfer): highest offset such that
+# all the preceding bytes are received
+RESUME_ACK_PAYLOAD = struct.Struct('!Q')
+# negotiated number of data segments in block (follows offset to resume from), 0 - no forward error correction
+FEC_ACK_PAYLOAD = struct.Struct('!B')
+
+
+class MalformedMessageError(Exception):
+    """
+    Error class for messages that cannot be parsed: unknown version, truncated message or wrong checksum.
+    """
+
+    def __init__(self, message="Malformed message."):
+        self.message = message
+        super().__init__(self.message)
+
+
+def pack(kind, transfer=0, seq=0, ack=0, payload=b'', flags=0):
+    """
+    Composes message from the header and payload.
+
+    :param kind: type of message.
+    :param transfer: identifier of transfer.
+    :param seq: sequence number.
+    :param ack: acknowledgement number.
+    :param payload: bytes of payload.
+    :param flags: flags of message.
+    :return: bytes of message.
+    """
+    return HEADER.pack(VERSION, kind, flags, transfer, seq, ack, len(payload), zlib.crc32(payload)) + payload
+
+
+def unpack(view):
+    """
+    Parses message in constant time: header is read by struct.unpack_from and payload is a slice of the same memory.
+
+    :param view: memoryview (or bytes) of received message.
+    :return: type, flags, identifier of transfer, sequence number, acknowledgement number, memoryview of payload.
+    """
+    if len(view) < HEADER.size:
+        raise MalformedMessageError("Message is shorter than header.")
+    version, kind, flags, transfer, seq, ack, length, checksum = HEADER.unpack_from(view)
+    if version != VERSION:
+        raise MalformedMessageError(f"Unsupported version: {version}")
+    payload = memoryview(view)[HEADER.size:HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise MalformedMessageError("Payload is corrupted.")
+    return kind, flags, transfer, seq, ack, payload
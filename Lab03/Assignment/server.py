@@ -5,146 +5,541 @@ Email: d.alukaev@innopolis.university
 Group:  B19-DS-01
 """
 
+import os
+import json
+import heapq
 import socket
+import hashlib
 import time
 
+from sink import Sink, FLUSH_SIZE
+from fec import add_segment, add_parity
+from protocol import HEADER, START, START_ACK, DATA, ACK, PARITY, STRIPE, RESUME, FEC, START_PAYLOAD, STRIPE_PAYLOAD, \
+    RESUME_PAYLOAD, FEC_PAYLOAD, START_ACK_PAYLOAD, RESUME_ACK_PAYLOAD, FEC_ACK_PAYLOAD, MalformedMessageError, pack, \
+    unpack
+
 HOST = '127.0.0.1'
 PORT = 65432
 ADDRESS = (HOST, PORT)
-BUFFER = 100
-
-
-def split_byte(byte_seq, sep=b'|', no_occur=2):
-    """
-    Function used to split the byte sequence by a separator.
-    Built-in function split tend to give wrong results when byte sequence contain separator that not intended to be.
-    For instance, it useful while processing data received by a socket. The data bytes might contain '|' symbol that
-    is separator.
-
-    :param byte_seq: byte sequence to be splitted.
-    :param sep: byte by which the sequence should be splitted.
-    :param no_occur: expected number of separators.
-    :return: list of byte sequences.
-    """
-
-    # determine indexes of separator occurrences
-    idxs = []
-    for idx, _byte in enumerate(byte_seq):
-        if _byte == 124:
-            idxs.append(idx)
-        if len(idxs) == no_occur:
-            break
-
-    # split the byte sequence basing on obtain indexes
-    splitted = []
-    for i, idx in enumerate(idxs):
-        if idx == idxs[0]:
-            # first occurrence
-            splitted.append(byte_seq[0:idx])
-            splitted.append(byte_seq[idx + 1:idxs[i + 1]])
-        elif idx == idxs[-1]:
-            # last occurrence
-            splitted.append(byte_seq[idx + 1:])
+# maximal size of message: payload of UDP datagram fitting into Ethernet MTU (1500 - 20 - 8)
+BUFFER = 1472
+# number of data bytes in a segment, the client splits file into segments of this size
+SEGMENT = BUFFER - HEADER.size
+# largest window server agrees to, proposed window is reduced to this value
+MAX_WINDOW = 64
+# largest block of segments protected by parity segment server agrees to
+MAX_FEC_BLOCK = 32
+# directory for partial files of resumable transfers and their manifests
+PARTIAL_DIRECTORY = 'files_server/partial'
+
+
+def receive_data(sock, session, seqnum, data):
+    """
+    Handles data message of the session.
+    Segment within the window is passed to the sink of session at its offset in the file, so that the cost does not
+    depend on the size of file; segments received out of order are remembered until the gap is filled. Every segment
+    (including duplicates) is acknowledged by message with the next expected sequence number as acknowledgement number
+    and sequence number of received segment. Window of one segment corresponds to stop-and-wait.
+
+    :param sock: server socket.
+    :param session: dictionary with information about the session.
+    :param seqnum: sequence number of received segment.
+    :param data: memoryview of data bytes of received segment.
+    :return: True if the segment is received for the first time, False - otherwise.
+    """
+    expected = session['expected']
+    new = False
+    if seqnum < expected or seqnum in session['out_of_order']:
+        session['stats']['duplicates'] += 1
+    elif seqnum > expected:
+        session['stats']['out_of_order'] += 1
+    offset = (seqnum - session['first']) * SEGMENT
+    if expected <= seqnum < expected + session['window'] and offset + len(data) <= session['expected_size']:
+        new = seqnum not in session['out_of_order']
+        session['sink'].write(session['base'] + offset, data)
+        session['out_of_order'].add(seqnum)
+        # deliver contiguous segments
+        while expected in session['out_of_order']:
+            session['out_of_order'].discard(expected)
+            expected += 1
+        session['expected'] = expected
+        session['received'] = min((expected - session['first']) * SEGMENT, session['expected_size'])
+    elif seqnum >= expected:
+        # segment beyond the window (or the file) is dropped, so it is not acknowledged selectively
+        seqnum = expected - 1
+    sock.sendto(pack(ACK, session['transfer'], seqnum, expected), session['address'])
+    return new
+
+
+def block_bounds(session, seqnum):
+    """
+    Determines block of segments protected by the same parity segment. Blocks are counted from the first segment sent
+    after the last start message, the last block of file might be shorter.
+
+    :param session: dictionary with information about the session.
+    :param seqnum: sequence number of segment.
+    :return: sequence number of the first segment of block, number of segments in block.
+    """
+    start = seqnum - (seqnum - session['origin']) % session['fec']
+    return start, min(session['fec'], session['last'] - start)
+
+
+def deliver_recovered(sock, session, recovered):
+    """
+    Handles segment reconstructed from parity as if it was received. Reconstructed value is padded to the size of
+    segment, the last segment of file is truncated to its actual size.
+
+    :param sock: server socket.
+    :param session: dictionary with information about the session.
+    :param recovered: sequence number and value of segment (see fec.recover).
+    """
+    seqnum, value = recovered
+    length = min(SEGMENT, session['expected_size'] - (seqnum - session['first']) * SEGMENT)
+    if length <= 0:
+        return
+    session['stats']['recovered'] += 1
+    receive_data(sock, session, seqnum, value.to_bytes(SEGMENT, 'little')[:length])
+
+
+def receive_segment(sock, session, seqnum, data):
+    """
+    Handles data message of the session. If forward error correction is negotiated, the segment is accounted in its
+    block, which might allow to reconstruct the lost segment of block without retransmission.
+
+    :param sock: server socket.
+    :param session: dictionary with information about the session.
+    :param seqnum: sequence number of received segment.
+    :param data: memoryview of data bytes of received segment.
+    """
+    if not receive_data(sock, session, seqnum, data) or not session['fec'] or seqnum < session['origin']:
+        return
+    start, size = block_bounds(session, seqnum)
+    recovered = add_segment(session['blocks'], start, size, seqnum, data)
+    if recovered is not None:
+        deliver_recovered(sock, session, recovered)
+
+
+def receive_parity(sock, session, start, size, data):
+    """
+    Handles parity message of the session: sequence number of the first segment of block and number of segments in
+    block are carried in the header.
+
+    :param sock: server socket.
+    :param session: dictionary with information about the session.
+    :param start: sequence number of the first segment of block.
+    :param size: number of segments in block.
+    :param data: memoryview of parity segment.
+    """
+    if not session['fec'] or start + size <= session['expected'] or start < session['origin'] or \
+            block_bounds(session, start) != (start, size):
+        # block is already received or it does not match the negotiated blocks
+        return
+    recovered = add_parity(session['blocks'], start, size, data)
+    if recovered is not None:
+        deliver_recovered(sock, session, recovered)
+
+
+def parse_start(flags, payload):
+    """
+    Parses payload of start message: size of file and proposed window, optional description of range and content hash
+    (depending on flags), extension of file.
+
+    :param flags: flags of start message.
+    :param payload: memoryview of payload.
+    :return: size of file, proposed window, description of range (None if not striped), digest (None if not
+    resumable), proposed size of block (0 if no forward error correction), extension.
+    """
+    fields = [START_PAYLOAD]
+    if flags & STRIPE:
+        fields.append(STRIPE_PAYLOAD)
+    if flags & RESUME:
+        fields.append(RESUME_PAYLOAD)
+    if flags & FEC:
+        fields.append(FEC_PAYLOAD)
+    if len(payload) < sum(field.size for field in fields):
+        raise MalformedMessageError("Start message is shorter than announced.")
+
+    size, window = START_PAYLOAD.unpack_from(payload)
+    offset = START_PAYLOAD.size
+    stripe, digest, fec = None, None, 0
+    if flags & STRIPE:
+        stripe = STRIPE_PAYLOAD.unpack_from(payload, offset)
+        offset += STRIPE_PAYLOAD.size
+    if flags & RESUME:
+        digest, = RESUME_PAYLOAD.unpack_from(payload, offset)
+        offset += RESUME_PAYLOAD.size
+    if flags & FEC:
+        fec, = FEC_PAYLOAD.unpack_from(payload, offset)
+        offset += FEC_PAYLOAD.size
+    return size, window, stripe, digest, fec, bytes(payload[offset:]).decode()
+
+
+def output_path(host, transfer, extension):
+    # files are named by host and identifier of transfer, so that transfers of the same host do not collide
+    return f"files_server/{host}.{transfer:08x}.{extension}"
+
+
+def checkpoint_paths(digest):
+    # partial file and manifest of resumable transfer are named by the content hash
+    name = os.path.join(PARTIAL_DIRECTORY, digest.hex())
+    return name + '.part', name + '.json'
+
+
+def save_checkpoint(session):
+    """
+    Persists manifest describing the received prefix of file, the partial file itself is already written by the sink,
+    so that the transfer can be resumed by a new session with the same content hash.
+
+    :param session: dictionary with information about the session.
+    """
+    session['sink'].close()
+    _, manifest = checkpoint_paths(session['digest'])
+    with open(manifest, 'w') as output:
+        json.dump({'size': session['expected_size'], 'extension': session['extension'],
+                   'received': session['received']}, output)
+
+
+def load_checkpoint(digest, size):
+    """
+    Reads manifest of the checkpoint with the content hash. Checkpoint is ignored if it describes file of other size or
+    its prefix is not aligned to segments.
+
+    :param digest: content hash of file.
+    :param size: size of file.
+    :return: number of contiguous bytes received from the beginning of file.
+    """
+    part, manifest = checkpoint_paths(digest)
+    try:
+        with open(manifest) as file:
+            info = json.load(file)
+        received = info['received']
+        if info['size'] != size or received % SEGMENT and received != size or os.path.getsize(part) < received:
+            return 0
+    except (OSError, ValueError, KeyError):
+        return 0
+    return received
+
+
+def remove_checkpoint(digest):
+    # checkpoint is not needed after the file is received
+    for path in checkpoint_paths(digest):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def release_checkpoint(session, key, digests):
+    """
+    Detaches the received file of resumable session from its checkpoint: the file is moved to the temporary path of
+    session and the content hash is released, so that a new transfer of the same file does not share the partial file
+    with the finished session waiting for its removal.
+
+    :param session: dictionary with information about the session.
+    :param key: key of the session.
+    :param digests: dictionary of resumable sessions, content hash -> key of session.
+    """
+    if digests.get(session['digest']) == key:
+        digests.pop(session['digest'])
+    session['sink'].move(session['path'] + '.part')
+    remove_checkpoint(session['digest'])
+
+
+def file_digest(path):
+    # SHA-256 digest of file, the file is read by blocks
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(FLUSH_SIZE), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def deadline(session):
+    # time when the session should be removed: 1 second after the last message if file is received, 3 seconds otherwise
+    finished = session['received'] == session['expected_size']
+    return session['time_reception'] + (1 if finished else 3)
+
+
+def open_stripe(transfers, host, transfer, stripe, extension):
+    """
+    Registers range of striped transfer. Ranges are written to the same temporary file by their own sinks, the file is
+    renamed when every range is received.
+
+    :param transfers: dictionary of striped transfers, (host, identifier of transfer) -> information about transfer.
+    :param host: host of client.
+    :param transfer: identifier of transfer.
+    :param stripe: description of range unpacked by STRIPE_PAYLOAD.
+    :param extension: extension of file.
+    :return: key of striped transfer, sink of range, offset of range.
+    """
+    index, stripes, offset, total = stripe
+    key = (host, transfer)
+    if key not in transfers:
+        path = output_path(host, transfer, extension)
+        transfers[key] = {'path': path, 'temporary': path + '.part', 'stripes': stripes, 'active': set(),
+                          'finished': set(), 'failed': False}
+    transfers[key]['active'].add(index)
+    return key, Sink(transfers[key]['temporary'], total), offset
+
+
+def close_stripe(transfers, session):
+    """
+    Unregisters range of striped transfer. When there are no active ranges, the file is renamed if every range was
+    received, otherwise it is removed.
+
+    :param transfers: dictionary of striped transfers.
+    :param session: dictionary with information about the session carrying the range.
+    """
+    transfer = transfers[session['group']]
+    session['sink'].close(sync=True)
+    transfer['active'].discard(session['stripe'])
+    if session['received'] == session['expected_size']:
+        transfer['finished'].add(session['stripe'])
+    else:
+        transfer['failed'] = True
+    if transfer['active']:
+        return
+    transfers.pop(session['group'])
+    if not transfer['failed'] and len(transfer['finished']) == transfer['stripes']:
+        os.replace(transfer['temporary'], transfer['path'])
+        print(f"Striped transfer of {transfer['stripes']} ranges was saved to {transfer['path']}.")
+    else:
+        os.remove(transfer['temporary'])
+        print(f"Striped transfer to {transfer['path']} is incomplete, erase file.")
+
+
+def expire_sessions(sessions, timers, transfers, digests):
+    """
+    Removes sessions whose deadline has passed. Timers are kept in a heap of pairs (deadline, key of session), the
+    deadline in the heap might be outdated since sessions are not rescheduled on every message: such timer is pushed
+    back with the actual deadline. Thus, only expired timers are examined instead of all the sessions.
+    For successfully finished sessions the file is atomically renamed to its final name. For inactive resumable
+    sessions saves checkpoint, files of other inactive sessions are removed.
+
+    :param sessions: dictionary of active sessions.
+    :param timers: heap of timers.
+    :param transfers: dictionary of striped transfers.
+    :param digests: dictionary of resumable sessions, content hash -> key of unfinished session.
+    """
+    now = time.time()
+    while timers and timers[0][0] <= now:
+        _, key = heapq.heappop(timers)
+        if key not in sessions:
+            continue
+        session = sessions[key]
+        actual = deadline(session)
+        if actual > now:
+            heapq.heappush(timers, (actual, key))
+            continue
+        sessions.pop(key)
+        address = session['address']
+        if session['digest'] is not None and digests.get(session['digest']) == key:
+            digests.pop(session['digest'])
+
+        if session['received'] != session['expected_size']:
+            if session['group'] is not None:
+                close_stripe(transfers, session)
+            elif session['digest'] is not None:
+                save_checkpoint(session)
+                print(f"Session with {address} is inactive for 3 seconds, {session['received']} bytes are saved to "
+                      f"resume.")
+                continue
+            else:
+                session['sink'].discard()
+            print(f"Session with {address} is inactive for 3 seconds, erase information.")
+            continue
+
+        if session['group'] is not None:
+            close_stripe(transfers, session)
+        elif session['digest'] is not None:
+            # the file is already detached from the checkpoint (see release_checkpoint)
+            if file_digest(session['sink'].path) != session['digest']:
+                session['sink'].discard()
+                print(f"File received from {address} does not match its content hash, erase information.")
+                continue
+            session['sink'].commit(session['path'])
         else:
-            # occurrence in the middle
-            splitted.append(byte_seq[idxs[i] + 1:idxs[i + 1]])
+            session['sink'].commit(session['path'])
+        print(f"Successfully finished session with {address} was deleted (1 second timeout).")
+        print(f"Session statistics: {session_stats(session)}")
 
-    return splitted
+
+def session_stats(session):
+    """
+    Summarizes statistics of the session.
+    Goodput is computed over the time between the start message and the last received segment.
+
+    :param session: dictionary with information about the session.
+    :return: dictionary with number of received segments, duplicates, segments received out of order, goodput.
+    """
+    stats = session['stats']
+    elapsed = session['time_reception'] - stats['start']
+    return {
+        'segments': stats['segments'],
+        'duplicates': stats['duplicates'],
+        'out_of_order': stats['out_of_order'],
+        'recovered': stats['recovered'],
+        'goodput': session['received'] / elapsed if elapsed > 0 else 0,
+    }
 
 
 def server():
     """
     Server side of UDP application transferring image.
-    Handles start message containing sequence number, extension and size of file. Create new entry in dictionary of
-    active sessions. Acknowledges arrival by message containing descriptor 'a', sequence number and buffer size.
-    Handles data message containing sequences number and data bytes. Concatenate data bytes with the current version of
-    file. Ignores repeated data bytes. Acknowledges arrival by message containing descriptor 'a' and sequence number.
+    Every message has the fixed binary header described in protocol.py, malformed messages are ignored.
+    Handles start message containing size of file, proposed size of window and extension. Create new entry in
+    dictionary of active sessions. Acknowledges arrival by message containing sequence number of the first data segment,
+    maximal size of message and negotiated size of window.
+    Handles data message containing sequences number and data bytes. Segments are streamed to temporary file by the sink
+    of session, segments received out of order are remembered, each segment is acknowledged selectively. Thus, memory
+    used by session does not depend on the size of file.
     Stores information about each session. If session is inactive (for 3 seconds) or successfully finished more
-    than 1 second ago, delete the information. For successfully finished sessions saves file.
+    than 1 second ago, delete the information. For successfully finished sessions the temporary file is renamed to
+    'files_server/<host>.<identifier of transfer>.<extension>'. Sessions are expired by heap of timers, so the cost of
+    message does not depend on the number of active sessions.
+    Sessions are identified by address of client and identifier of transfer. In striped transfer several sessions of
+    the same host carry ranges of one file, they are tied by identifier of transfer and write ranges to the same file.
+    Resumable transfer is identified by content hash of file. Start message with the hash of unfinished session of the
+    same host takes it over, otherwise the received prefix is restored from checkpoint (saved when session becomes
+    inactive). The response contains the offset to resume from, the client sends only the bytes following it.
+    If forward error correction is negotiated, the client follows every block of segments by parity segment, a single
+    lost segment of block is reconstructed from the parity and the other segments without retransmission.
     """
     sessions = {}
+    # striped transfers, (host, identifier of transfer) -> information about transfer
+    transfers = {}
+    # unfinished resumable sessions, content hash -> key of session
+    digests = {}
+    # heap of pairs (deadline, key of session)
+    timers = []
+    # messages are received into the same buffer and parsed without copying
+    buffer = bytearray(BUFFER)
+    view = memoryview(buffer)
+    os.makedirs(PARTIAL_DIRECTORY, exist_ok=True)
 
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
         sock.bind(ADDRESS)
-        sock.settimeout(0.5)
         while True:
-            # check whether information about successfully finished sessions should be removed
-            for host in list(sessions.keys()):
-                current_file = sessions[host]['file']
-                expected_size = sessions[host]['expected_size']
-                last_message = sessions[host]['time_reception']
-                if len(current_file) == expected_size and time.time() - last_message >= 1:
-                    info = sessions.pop(host)
-                    # save file
-                    name = f"{host}.{info['extension']}"
-                    path = 'files_server/' + name
-                    with open(path, 'wb+') as output:
-                        output.write(info['file'])
-                    print(f"Successfully finished session with host {host} was deleted (1 second timeout).")
-
-            # check whether the client is active for three seconds
-            for host in list(sessions.keys()):
-                last_message = sessions[host]['time_reception']
-                if time.time() - last_message >= 3:
-                    sessions.pop(host)
-                    print(f"Session with host {host} is inactive for 3 seconds, erase information.")
+            # remove sessions that are finished or inactive
+            expire_sessions(sessions, timers, transfers, digests)
+            # wait for message not longer than until the earliest timer expires
+            sock.settimeout(min(max(timers[0][0] - time.time(), 0.001), 0.5) if timers else 0.5)
 
             try:
-                # receive file_info
-                message, address = sock.recvfrom(BUFFER)
-                # either 's' or 'd', start or data message respectively
-                descriptor = message[:1].decode()
-            except:
-                # in order to constantly check if sessions' information should be deleted, timeout was set to 0.5
+                size, address = sock.recvfrom_into(buffer)
+                kind, flags, transfer, seqnum, acknum, payload = unpack(view[:size])
+            except socket.timeout:
+                # in order to check if sessions' information should be deleted, timeout does not exceed 0.5
+                continue
+            except MalformedMessageError:
                 continue
+            key = (address[0], address[1], transfer)
 
-            if descriptor == 's':
-                # start message
-
-                # split byte sequence and decode each piece
-                message = split_byte(message, no_occur=3)
-                message[0] = message[0].decode()
-                message[1] = message[1].decode()
-                message[2] = message[2].decode()
-                message[3] = message[3].decode()
-                # create an entry with information about the session
-                sessions[address[0]] = {
-                    'extension': message[2],
-                    'seqn': int(message[1]),
-                    'expected_size': int(message[3]),
-                    'time_reception': time.time(),
-                    'file': b""
-                }
-
-                # increment sequence number
-                sessions[address[0]]['seqn'] += 1
-                # compose and send ack response
-                ack_message = f"a|{sessions[address[0]]['seqn']}|{BUFFER}"
-                sock.sendto(ack_message.encode(), address)
-
-            if descriptor == 'd':
-                # data message
-                # split byte sequence and decode descriptor and sequence number
-                message = split_byte(message, no_occur=2)
-                message[0] = message[0].decode()
-                # sequence number
-                message[1] = message[1].decode()
+            if kind == START:
+                try:
+                    expected_size, window, stripe, digest, fec, extension = parse_start(flags, payload)
+                except (MalformedMessageError, UnicodeDecodeError):
+                    continue
+                if stripe is not None:
+                    # ranges of striped transfer are written directly to the shared file, they are not resumed
+                    digest = None
+                owner = digests.get(digest, key) if digest is not None else key
+                if owner != key and owner[0] == address[0]:
+                    # client resumes transfer from another port, its unfinished session is taken over
+                    sessions[key] = sessions.pop(owner)
+                    sessions[key].update(address=address, transfer=transfer, extension=extension,
+                                         path=output_path(address[0], transfer, extension))
+                    digests[digest] = key
+                    heapq.heappush(timers, (deadline(sessions[key]), key))
+                elif owner != key:
+                    # the same file is being transferred by another host, the partial file is not shared with it
+                    digest = None
+                if key in sessions:
+                    # start message is retransmitted (the previous response was lost) or transfer is resumed
+                    session = sessions[key]
+                else:
+                    session = {
+                        'address': address,
+                        'transfer': transfer,
+                        'extension': extension,
+                        'path': output_path(address[0], transfer, extension),
+                        # sequence number of the next expected data segment
+                        'expected': seqnum + 1,
+                        'expected_size': expected_size,
+                        'time_reception': time.time(),
+                        # data is streamed to temporary file by the sink
+                        'sink': None,
+                        # offset of the data of session in the file (offset of range in striped transfer)
+                        'base': 0,
+                        # number of contiguous bytes received from the beginning of file
+                        'received': 0,
+                        'first': seqnum + 1,
+                        'window': min(max(window, 1), MAX_WINDOW),
+                        # sequence numbers of segments received out of order
+                        'out_of_order': set(),
+                        # striped transfer: key of striped transfer, index of range
+                        'group': None,
+                        'stripe': None,
+                        # content hash of resumable transfer
+                        'digest': digest,
+                        # forward error correction: number of segments in block (0 - disabled), sequence number of the
+                        # first segment of the first block, sequence number following the last segment of file, state
+                        # of blocks
+                        'fec': min(fec, MAX_FEC_BLOCK),
+                        'origin': seqnum + 1,
+                        'last': seqnum + 1 + -(-expected_size // SEGMENT),
+                        'blocks': {},
+                        'stats': {'start': time.time(), 'segments': 0, 'duplicates': 0, 'out_of_order': 0,
+                                  'recovered': 0}
+                    }
+                    if stripe is not None:
+                        session['stripe'] = stripe[0]
+                        session['group'], session['sink'], session['base'] = \
+                            open_stripe(transfers, address[0], transfer, stripe, extension)
+                    elif digest is not None:
+                        # partial file of resumable transfer is kept until the file is received
+                        session['received'] = load_checkpoint(digest, expected_size)
+                        session['expected'] = session['first'] + -(-session['received'] // SEGMENT)
+                        session['sink'] = Sink(checkpoint_paths(digest)[0], expected_size)
+                        digests[digest] = key
+                        if session['received'] == expected_size:
+                            # the whole file is restored from checkpoint
+                            release_checkpoint(session, key, digests)
+                    else:
+                        session['sink'] = Sink(session['path'] + '.part', expected_size)
+                    # create an entry with information about the session
+                    sessions[key] = session
+                    heapq.heappush(timers, (deadline(session), key))
+                session['time_reception'] = time.time()
+                # the client sends every segment following the one it is responded with, so blocks start from it
+                session['origin'] = session['expected'] if session['digest'] is not None else session['first']
+                session['blocks'].clear()
+                session['out_of_order'].clear()
+                # compose and send ack response, resumable transfer continues from the next expected segment
+                ack_payload = START_ACK_PAYLOAD.pack(BUFFER, session['window'])
+                ack_flags = 0
+                if session['digest'] is not None:
+                    ack_payload += RESUME_ACK_PAYLOAD.pack(session['received'])
+                    ack_flags |= RESUME
+                if flags & FEC:
+                    ack_payload += FEC_ACK_PAYLOAD.pack(session['fec'])
+                    ack_flags |= FEC
+                sock.sendto(pack(START_ACK, transfer, seqnum, session['origin'], ack_payload, ack_flags), address)
 
+            if kind in (DATA, PARITY) and key in sessions:
+                session = sessions[key]
                 # update time of last reception
-                sessions[address[0]]['time_received'] = time.time()
-
-                if int(message[1]) > sessions[address[0]]['seqn']:
-                    # not a duplicate message
-
-                    # update sequence number
-                    sessions[address[0]]['seqn'] = int(message[1])
-                    # append new packet
-                    sessions[host]['file'] += message[2]
-                    # increment sequence number
-                    sessions[address[0]]['seqn'] += 1
-                    # compose and send ack response
-                    ack_message = f"a|{sessions[address[0]]['seqn']}"
-                    sock.sendto(ack_message.encode(), address)
+                session['time_reception'] = time.time()
+                finished = session['received'] == session['expected_size']
+                if kind == DATA:
+                    session['stats']['segments'] += 1
+                    receive_segment(sock, session, seqnum, payload)
+                else:
+                    # parity message carries the first segment of block and number of segments in block
+                    receive_parity(sock, session, seqnum, acknum, payload)
+                if not finished and session['received'] == session['expected_size']:
+                    # file is received, session is removed earlier than the inactive one
+                    heapq.heappush(timers, (deadline(session), key))
+                    if session['digest'] is not None:
+                        release_checkpoint(session, key, digests)
 
 
 if __name__ == '__main__':
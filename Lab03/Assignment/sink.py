@@ -0,0 +1,96 @@
+"""
+Lab-03. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import os
+import time
+
+# contiguous data is accumulated in memory up to this size before it is written to the file
+FLUSH_SIZE = 1 << 18
+# accumulated data is written to the file not later than this number of seconds after the previous write
+FLUSH_INTERVAL = 0.5
+
+
+class Sink:
+    """
+    Class streaming received segments to a temporary file, so that the memory used by session does not depend on the
+    size of file. Segments following each other are accumulated in a buffer of bounded size and written by a single
+    positional write; segment that does not continue the buffer is written immediately. The buffer is flushed when it
+    is full, when it has been kept for too long or before the file is closed.
+    Several sinks might be opened on the same file (ranges of striped transfer), positional writes do not interfere.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT)
+        # file is extended to its final size, bytes already written (resumed transfer) are kept
+        os.ftruncate(self.fd, size)
+        self.buffer = bytearray()
+        # offset of the first byte of buffer in the file
+        self.offset = 0
+        self.flushed = time.time()
+
+    def write(self, offset, data):
+        """
+        Writes data to the file at offset.
+
+        :param offset: offset in the file.
+        :param data: bytes or memoryview of data, it is copied before return.
+        """
+        if offset != self.offset + len(self.buffer):
+            self.flush()
+            self.offset = offset
+        self.buffer += data
+        if len(self.buffer) >= FLUSH_SIZE or time.time() - self.flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        # writes the accumulated data to the file
+        if self.buffer:
+            os.pwrite(self.fd, self.buffer, self.offset)
+            self.offset += len(self.buffer)
+            self.buffer.clear()
+        self.flushed = time.time()
+
+    def close(self, sync=False):
+        """
+        Flushes the buffer and closes the file.
+
+        :param sync: whether the file should be written to the disk before it is closed.
+        """
+        if self.fd is None:
+            return
+        self.flush()
+        if sync:
+            os.fsync(self.fd)
+        os.close(self.fd)
+        self.fd = None
+
+    def move(self, path):
+        """
+        Closes the file and renames it, the sink refers to the file under the new name.
+
+        :param path: new path of the file.
+        """
+        self.close()
+        os.replace(self.path, path)
+        self.path = path
+
+    def commit(self, path):
+        """
+        Closes the file and atomically renames it, so that the file appears under the final name only when it is
+        complete.
+
+        :param path: final path of the file.
+        """
+        self.close(sync=True)
+        os.replace(self.path, path)
+
+    def discard(self):
+        # closes and removes the incomplete file
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
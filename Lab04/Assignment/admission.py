@@ -0,0 +1,131 @@
+"""
+Lab-04. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import time
+from collections import deque
+from threading import Condition
+
+from protocol import frame
+
+FULL = "The server is full"
+EXPIRED = "The waiting time is over, try again later"
+
+
+def position_message(position):
+    # message notifying the waiting client about its position in the queue
+    return f"Waiting in the queue, position: {position}"
+
+
+def notify(connection, message):
+    """
+    Sends message to the waiting client without blocking, since the lock of admission is held meanwhile. Client that
+    has disconnected or does not read its messages is not an error.
+
+    :param connection: socket of the client.
+    :param message: string to be sent.
+    :return: whether the whole message is sent.
+    """
+    data = frame(message)
+    timeout = connection.gettimeout()
+    try:
+        connection.settimeout(0)
+        return connection.send(data) == len(data)
+    except OSError:
+        return False
+    finally:
+        connection.settimeout(timeout)
+
+
+class Admission:
+    """
+    Class of admission control between the accepting thread and fixed pool of worker threads. Client is handed to an
+    idle worker immediately; if every worker is busy, client waits in FIFO queue of bounded capacity and is notified
+    about its position each time it changes. Client is rejected if the queue is full and removed from the queue if it
+    has waited for too long. Notifications are sent without blocking: client whose notification does not fit into its
+    socket buffer is dropped, so that client that does not read cannot stall admission.
+    Collects statistics: number of accepted (handed to worker), queued, rejected, expired and dropped clients.
+    """
+
+    def __init__(self, capacity, max_wait):
+        self.capacity = capacity
+        self.max_wait = max_wait
+        # waiting clients: socket, time of arrival
+        self.waiting = deque()
+        # number of workers waiting for clients
+        self.idle = 0
+        self.condition = Condition()
+        self.stats = {'accepted': 0, 'queued': 0, 'rejected': 0, 'expired': 0, 'dropped': 0}
+
+    def drop(self, connection):
+        # closes connection of the client whose notification is not sent, its stream of messages is broken
+        self.stats['dropped'] += 1
+        connection.close()
+
+    def notify_positions(self):
+        # notifies waiting clients about their positions, clients to be taken by idle workers are not notified
+        waiting, self.waiting = self.waiting, deque()
+        for connection, arrival in waiting:
+            position = len(self.waiting) + 1 - self.idle
+            if position > 0 and not notify(connection, position_message(position)):
+                self.drop(connection)
+                continue
+            self.waiting.append((connection, arrival))
+
+    def admit(self, connection):
+        """
+        Hands the client to idle worker or puts it in the queue. If the queue is full, the client is notified and
+        its connection is closed.
+
+        :param connection: socket of the client.
+        :return: whether the client is admitted.
+        """
+        with self.condition:
+            # number of clients (including this one) that wait for busy workers
+            position = len(self.waiting) + 1 - self.idle
+            if position > self.capacity:
+                self.stats['rejected'] += 1
+                notify(connection, FULL)
+                connection.close()
+                return False
+            if position > 0:
+                if not notify(connection, position_message(position)):
+                    self.drop(connection)
+                    return False
+                self.stats['queued'] += 1
+            self.waiting.append((connection, time.time()))
+            self.condition.notify()
+        return True
+
+    def take(self):
+        """
+        Waits for the client, supposed to be called by worker.
+
+        :return: socket of the client that has waited the longest.
+        """
+        with self.condition:
+            self.idle += 1
+            while not self.waiting:
+                self.condition.wait()
+            self.idle -= 1
+            connection, _ = self.waiting.popleft()
+            self.stats['accepted'] += 1
+            self.notify_positions()
+        return connection
+
+    def expire(self):
+        # removes clients that have waited for longer than allowed, supposed to be called periodically
+        with self.condition:
+            deadline = time.time() - self.max_wait
+            expired = False
+            while self.waiting and self.waiting[0][1] < deadline:
+                connection, _ = self.waiting.popleft()
+                self.stats['expired'] += 1
+                notify(connection, EXPIRED)
+                connection.close()
+                expired = True
+            if expired:
+                self.notify_positions()
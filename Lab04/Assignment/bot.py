@@ -0,0 +1,138 @@
+"""
+Lab-04. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import sys
+import time
+import asyncio
+
+from protocol import frame, read_message
+from metrics import Histogram
+
+# number of concurrent game sessions
+SESSIONS = 100
+# range of numbers announced by the bot, binary search always wins within 5 attempts if it has at most 31 numbers
+LOW = 1
+HIGH = 31
+
+
+async def play(host, port, low, high):
+    """
+    Plays one game with the server by binary search over the range.
+
+    :param host: address of the server.
+    :param port: port of the server.
+    :param low: lower bound of the range.
+    :param high: upper bound of the range.
+    :return: dictionary with outcome ("You win!", "You lose", response of the server that refused the game or
+    "Connection lost"), latencies of rounds in seconds (from sending the guess to receiving the response), duration of
+    session and time spent in the queue in seconds.
+    """
+    start = time.perf_counter()
+    result = {'outcome': "Connection lost", 'rounds': [], 'duration': 0, 'waiting': 0}
+    writer = None
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        # either "Server is full", position in the queue or welcome message
+        message = await read_message(reader)
+        while message.startswith("Waiting in the queue"):
+            message = await read_message(reader)
+        result['waiting'] = time.perf_counter() - start
+        if not message.startswith("Welcome"):
+            result['outcome'] = message
+            return result
+
+        # range is sent and the number of attempts is accepted
+        writer.write(frame(f"{low} {high}"))
+        await read_message(reader)
+        while True:
+            guess = (low + high) // 2
+            # latency of round is measured from sending the guess, time of choosing it is not included
+            sent = time.perf_counter()
+            writer.write(frame(str(guess)))
+            response = await read_message(reader)
+            result['rounds'].append(time.perf_counter() - sent)
+            if response == "Greater":
+                low = guess + 1
+            elif response == "Less":
+                high = guess - 1
+            else:
+                result['outcome'] = response
+                return result
+            # number of attempts left
+            await read_message(reader)
+    except (OSError, ValueError, asyncio.IncompleteReadError):
+        return result
+    finally:
+        result['duration'] = time.perf_counter() - start
+        if writer is not None:
+            writer.close()
+
+
+async def run(host, port, sessions, low, high):
+    """
+    Plays the given number of games concurrently.
+
+    :param host: address of the server.
+    :param port: port of the server.
+    :param sessions: number of concurrent sessions.
+    :param low: lower bound of the range.
+    :param high: upper bound of the range.
+    :return: dictionary with number of sessions by outcome, summaries of histograms of round latency, session duration
+    and waiting time, total time and rate of sessions per second.
+    """
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play(host, port, low, high) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    outcomes = {}
+    rounds, durations, waiting = Histogram(), Histogram(), Histogram()
+    for result in results:
+        outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+        [rounds.add(latency) for latency in result['rounds']]
+        durations.add(result['duration'])
+        waiting.add(result['waiting'])
+    return {'outcomes': outcomes, 'rounds': rounds.summary(), 'sessions': durations.summary(),
+            'waiting': waiting.summary(), 'elapsed': round(elapsed, 3), 'rate': round(sessions / elapsed, 1)}
+
+
+def parse_arguments():
+    """
+    Function used to parse and validate command line arguments.
+    :return: address and port of the server, number of sessions, bounds of the range.
+    """
+    if len(sys.argv) < 3 or not sys.argv[2].isdigit():
+        raise Exception('Address and port of the server should be specified.')
+    host, port, sessions, low, high = sys.argv[1], int(sys.argv[2]), SESSIONS, LOW, HIGH
+    for argument in sys.argv[3:]:
+        name, _, value = argument.partition('=')
+        try:
+            if name == '--sessions':
+                sessions = int(value)
+            elif name == '--range':
+                low, high = map(int, value.split('-'))
+            else:
+                raise Exception(f'Unknown argument: {argument}')
+        except ValueError:
+            raise Exception(f'Wrong value of argument: {argument}')
+    if sessions < 1:
+        raise Exception('Number of sessions should be positive.')
+    if low >= high:
+        raise Exception('The first number of range should be less.')
+    return host, port, sessions, low, high
+
+
+if __name__ == "__main__":
+    # parse command line arguments
+    try:
+        host, port, sessions, low, high = parse_arguments()
+    except Exception as e:
+        print(e)
+        print("Usage example: python ./bot.py <address> <port> [--sessions=100] [--range=1-31]")
+        sys.exit()
+
+    for key, value in asyncio.run(run(host, port, sessions, low, high)).items():
+        print(f"{key}: {value}")
@@ -8,6 +8,8 @@ Group:  B19-DS-01
 import socket
 import sys
 
+from protocol import frame, FrameReader
+
 
 def client():
     """
@@ -17,9 +19,10 @@ def client():
     Connects to the server using the provided address and port. If it is not available, notify the user.
     Waits the message from the server, it is either
     1. Warning "The server is full"
-    2. New port.
-    If the server is full, the connection is closed. Otherwise, connects to the new port of server.
-    Game starts. Accepts welcome message from the server.
+    2. Position in the queue, repeated each time the position changes.
+    3. Warning that the waiting time is over.
+    4. Welcome message.
+    If the server is full or the waiting time is over, the connection is closed. Otherwise, game starts.
     Reads the range of numbers from the command prompt and send it to the server.
     In the loop, function:
     1. Sends the guess number.
@@ -35,29 +38,27 @@ def client():
 
     try:
         # connect to the server with provided address and port
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            try:
-                sock.connect((server_host, server_port))
-            except:
-                print("Server is unavailable")
-                return
-            # either "Server is full" or new port number
-            response = sock.recv(1024).decode()
-            if response == "The server is full":
-                print(response)
-                return
-
-        # connect to the server with new port
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            try:
-                sock.connect((server_host, int(response)))
-            except:
-                print("Server is unavailable")
-                return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.connect((server_host, server_port))
+        except:
+            print("Server is unavailable")
+            sock.close()
+            return
+        # messages are framed, so that messages sent by the server together are read one by one
+        reader = FrameReader(sock)
+        # either "Server is full", position in the queue or welcome message
+        response = reader.read()
+        while response.startswith("Waiting in the queue"):
+            print(response)
+            response = reader.read()
+        if response in ["The server is full", "The waiting time is over, try again later"]:
+            print(response)
+            sock.close()
+            return
 
-            # accept welcome message
-            message = sock.recv(1024).decode()
-            print(message)
+        with sock:
+            print(response)
 
             num_range = input("> ")
             # read and check for validity range of numbers
@@ -72,28 +73,30 @@ def client():
                     continue
             # send the range of numbers
             try:
-                sock.send(num_range.encode())
+                sock.sendall(frame(num_range))
             except:
                 print("Connection lost")
                 return
 
             while True:
                 # number of attempts
-                message = sock.recv(1024).decode()
+                message = reader.read()
                 print(message)
 
                 try:
                     guess = input("> ")
-                    sock.send(guess.encode())
+                    sock.sendall(frame(guess))
                 except:
                     print("Connection lost")
                     return
 
                 # correctness of guess
-                response = sock.recv(1024).decode()
+                response = reader.read()
                 print(response)
                 if response not in ["Greater", "Less"]:
                     break
+    except ConnectionError:
+        print("Connection lost")
     except KeyboardInterrupt:
         return
 
@@ -0,0 +1,105 @@
+"""
+Lab-04. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+import time
+import threading
+
+# upper bounds of buckets of histograms, in milliseconds; the last bucket holds every longer value
+BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class Histogram:
+    """
+    Class of histogram of durations with fixed buckets, keeps number of values, their sum and maximum.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+
+    def add(self, seconds):
+        milliseconds = seconds * 1000
+        index = next((i for i, bound in enumerate(BUCKETS) if milliseconds <= bound), len(BUCKETS))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+
+    def percentile(self, fraction):
+        # upper bound of the bucket holding the given fraction of values (at most the maximum), in milliseconds
+        threshold = fraction * self.count
+        accumulated = 0
+        for index, count in enumerate(self.counts):
+            accumulated += count
+            if count and accumulated >= threshold:
+                return round(min(BUCKETS[index] if index < len(BUCKETS) else self.maximum, self.maximum), 3)
+        return 0
+
+    def summary(self):
+        """
+        :return: dictionary with number of values, mean, median, 99th percentile and maximum in milliseconds, and
+        non-empty buckets (upper bound -> number of values).
+        """
+        buckets = {str(bound): count for bound, count in zip(BUCKETS + ['inf'], self.counts) if count}
+        return {'count': self.count, 'mean': round(self.total / self.count, 3) if self.count else 0,
+                'p50': self.percentile(0.5), 'p99': self.percentile(0.99), 'max': round(self.maximum, 3),
+                'buckets': buckets}
+
+
+class Metrics:
+    """
+    Class of metrics of game sessions shared by threads of the server: histograms of round latency (time from sending
+    the number of attempts left to sending the response to the guess) and of session duration, number of active and
+    finished sessions.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rounds = Histogram()
+        self.sessions = Histogram()
+        self.active = 0
+        self.finished = 0
+
+    def session_started(self):
+        with self.lock:
+            self.active += 1
+
+    def session_finished(self, seconds):
+        with self.lock:
+            self.active -= 1
+            self.finished += 1
+            self.sessions.add(seconds)
+
+    def round_finished(self, seconds):
+        with self.lock:
+            self.rounds.add(seconds)
+
+    def snapshot(self):
+        """
+        :return: dictionary with summaries of histograms, number of active and finished sessions and number of threads
+        of the process.
+        """
+        with self.lock:
+            return {'active': self.active, 'finished': self.finished, 'threads': threading.active_count(),
+                    'rounds': self.rounds.summary(), 'sessions': self.sessions.summary()}
+
+
+def dump_periodically(interval, describe):
+    """
+    Starts daemon thread printing statistics of the server periodically.
+
+    :param interval: period in seconds.
+    :param describe: function returning dictionary with statistics.
+    """
+    def dump():
+        while True:
+            time.sleep(interval)
+            print(f"Statistics: {describe()}", flush=True)
+
+    threading.Thread(target=dump, daemon=True).start()
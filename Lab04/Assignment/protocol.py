@@ -0,0 +1,79 @@
+"""
+Lab-04. Distributed and Network Programming.
+Author: Danis Alukaev
+Email: d.alukaev@innopolis.university
+Group:  B19-DS-01
+"""
+
+from struct import Struct
+
+# every message is preceded by its length in bytes, so that messages sent together are separated by the receiver
+HEADER = Struct('!H')
+# messages of the game are short, longer message is considered malformed
+MAX_LENGTH = 1024
+# number of bytes requested from the socket at once, several messages might be received by a single call
+BUFFER = 4096
+
+
+def frame(*messages):
+    """
+    Encodes messages, so that they can be sent by a single call.
+
+    :param messages: strings to be sent.
+    :return: bytes of framed messages.
+    """
+    data = bytearray()
+    for message in messages:
+        encoded = message.encode()
+        data += HEADER.pack(len(encoded)) + encoded
+    return bytes(data)
+
+
+def parse_length(header):
+    # length of message from its header, checked for validity
+    length, = HEADER.unpack(header)
+    if length > MAX_LENGTH:
+        raise ValueError(f"Message of {length} bytes is too long")
+    return length
+
+
+class FrameReader:
+    """
+    Class of buffered reader of framed messages from blocking socket. Bytes received beyond the current message are
+    kept for the following messages.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def read_exactly(self, size):
+        # receives bytes until the buffer holds at least size of them, returns the first size bytes
+        while len(self.buffer) < size:
+            data = self.sock.recv(BUFFER)
+            if not data:
+                raise ConnectionError("Connection closed")
+            self.buffer += data
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read(self):
+        """
+        Reads the next message.
+
+        :return: decoded message.
+        """
+        length = parse_length(self.read_exactly(HEADER.size))
+        return self.read_exactly(length).decode()
+
+
+async def read_message(reader):
+    """
+    Reads the next message from asyncio stream.
+
+    :param reader: StreamReader of the connection.
+    :return: decoded message.
+    """
+    length = parse_length(await reader.readexactly(HEADER.size))
+    return (await reader.readexactly(length)).decode()
@@ -7,165 +7,315 @@ Group:  B19-DS-01
 
 import sys
 import socket
-import random
 import time
+import random
+import asyncio
 from threading import Thread
 
+from protocol import frame, FrameReader, read_message
+from admission import Admission
+from metrics import Metrics, dump_periodically
+
 HOST = '127.0.0.1'
-MAX_CONNECTIONS = 2
+# number of worker threads of the server, each of them plays one game at a time
+WORKERS = 2
+# maximal number of clients waiting for worker, further clients are rejected
+QUEUE_SIZE = 8
+# client waiting for longer than this number of seconds is removed from the queue
+MAX_WAIT = 30
+# time to wait for message of the client in seconds, stalled client releases its worker
+CLIENT_TIMEOUT = 60
+# period of checking the queue for clients waiting for too long, in seconds
+EXPIRY_INTERVAL = 0.5
+# period of printing statistics of the server in seconds, 0 - statistics are printed only when the server stops
+STATS_INTERVAL = 0
+# length of the queue of pending connections, games of asyncio server are not limited in number
+BACKLOG = 1024
+ATTEMPTS_PER_GAME = 5
+WELCOME = "Welcome to the number guessing game!\nEnter the range:"
+
+
+def judge(number, guess, attempts):
+    """
+    Evaluates the guess of user.
+
+    :param number: number to be guessed.
+    :param guess: number suggested by user.
+    :param attempts: number of attempts used including this one.
+    :return: response to the user: "You win!", "You lose", "Greater" or "Less".
+    """
+    if guess == number:
+        return "You win!"
+    if attempts == ATTEMPTS_PER_GAME:
+        return "You lose"
+    return "Greater" if guess < number else "Less"
+
 
+def attempts_left(attempts):
+    # message announcing the number of attempts left
+    return f"You have {ATTEMPTS_PER_GAME - attempts} attempts"
 
-def treat_client(port):
+
+def round_messages(response, attempts):
     """
-    Worker function supposed to run in the thread.
-    Creates new socket and binds to it using the same host, but different port number provided as argument.
-    Waits for the client connection for 5 seconds.
+    Messages sent to the user after the guess: the response and, if the game continues, the number of attempts left.
+
+    :param response: response to the guess, see judge.
+    :param attempts: number of attempts used.
+    :return: list of messages.
+    """
+    if response in ("Greater", "Less"):
+        return [response, attempts_left(attempts)]
+    return [response]
+
+
+def treat_client(connection, metrics):
+    """
+    Plays the game with the client on the provided connection.
     Sends welcome message with game rules.
     Accepts the range of numbers, in which user will guess. Checks for validity of the range.
-    User has 5 attempts to guess the number.
+    User has 5 attempts to guess the number. Sends attempts left.
     In the loop, function:
-    1. Sends attempts left.
-    2. Accepts the guess.
-    3. Sends whether the number is greater or less.
+    1. Accepts the guess.
+    2. Sends whether the number is greater or less together with attempts left.
+    Messages are framed (see protocol), so that messages sent together are separated by the client.
     In case the number is guessed, the user won. If the all attempts are used, the user lost.
 
-    :param port: port to establish new socket.
+    :param connection: socket of the client.
+    :param metrics: Metrics of the server, duration of session and of each round are recorded.
     """
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        # try to bind to the provided port and localhost address
+    metrics.session_started()
+    start = time.perf_counter()
+    with connection:
         try:
-            sock.bind((HOST, port))
-            sock.listen(1)
-        except:
-            print("Error while binding to the random port")
-            return
-
-        # wait for 5 seconds for incoming connection
-        sock.settimeout(5)
-        try:
-            connection, host = sock.accept()
-
+            reader = FrameReader(connection)
             # send welcome message
-            connection.send("Welcome to the number guessing game!\nEnter the range:".encode())
+            connection.sendall(frame(WELCOME))
             # accept the range of numbers and randomly select number within the interval
-            num_range = map(int, connection.recv(1024).decode().split(' '))
+            num_range = map(int, reader.read().split(' '))
             number = random.randint(*num_range)
 
+            # attempts left
+            connection.sendall(frame(attempts_left(0)))
+            round_start = time.perf_counter()
             ATTEMPTS = 0
             while True:
-                # attempts left
-                connection.send(f"You have {5 - ATTEMPTS} attempts".encode())
                 # accept user's guess
-                guess = int(connection.recv(1024).decode())
+                guess = int(reader.read())
                 ATTEMPTS += 1
 
                 # check whether the number is guessed, greater or less than original
-                if guess == number:
-                    connection.send("You win!".encode())
+                # the response and the number of attempts left are sent together
+                response = judge(number, guess, ATTEMPTS)
+                connection.sendall(frame(*round_messages(response, ATTEMPTS)))
+                now = time.perf_counter()
+                metrics.round_finished(now - round_start)
+                round_start = now
+                if response not in ("Greater", "Less"):
                     break
+        except (ValueError, TypeError, OSError):
+            # malformed range or guess, the client disconnected or has not sent message for CLIENT_TIMEOUT seconds
+            pass
+        finally:
+            metrics.session_finished(time.perf_counter() - start)
 
-                if ATTEMPTS == 5:
-                    connection.send("You lose".encode())
-                    break
 
-                if guess < number:
-                    connection.send("Greater".encode())
+def worker(admission, metrics):
+    """
+    Worker function supposed to run in the thread of pool.
+    In the loop takes the client that has waited the longest and plays the game with it.
 
-                if guess > number:
-                    connection.send("Less".encode())
+    :param admission: Admission of the server.
+    :param metrics: Metrics of the server.
+    """
+    while True:
+        treat_client(admission.take(), metrics)
 
-                # the program was tested on Windows, Mac and Ubuntu
-                # the latter OS tend to concatenate two messages (this behavior is not observed anywhere else)
-                # to avoid this issue, one can use delay
-                time.sleep(0.00001)
-            connection.close()
-        except:
-            # ends if no connection
-            return
 
+async def play(reader, writer, metrics):
+    """
+    Coroutine playing the game with the client connected to asyncio server. The flow of messages is the same as in
+    treat_client, but games are not limited by the number of threads.
 
-def get_free_port():
+    :param reader: StreamReader of the connection.
+    :param writer: StreamWriter of the connection.
+    :param metrics: Metrics of the server.
     """
-    Auxiliary function used to generate random free port for the thread workers.
-    Binds to the socket with port 0, which specifies to the OS that we allocate any free port.
-    Get the port and close the socket.
+    metrics.session_started()
+    start = time.perf_counter()
+    try:
+        # send welcome message
+        writer.write(frame(WELCOME))
+        await writer.drain()
+        # accept the range of numbers and randomly select number within the interval
+        num_range = map(int, (await read_message(reader)).split(' '))
+        number = random.randint(*num_range)
+
+        # attempts left
+        writer.write(frame(attempts_left(0)))
+        await writer.drain()
+        round_start = time.perf_counter()
+        attempts = 0
+        while True:
+            # accept user's guess
+            guess = int(await read_message(reader))
+            attempts += 1
+
+            response = judge(number, guess, attempts)
+            writer.write(frame(*round_messages(response, attempts)))
+            await writer.drain()
+            now = time.perf_counter()
+            metrics.round_finished(now - round_start)
+            round_start = now
+            if response not in ("Greater", "Less"):
+                break
+    except (ValueError, TypeError, ConnectionError, asyncio.IncompleteReadError):
+        # malformed range or guess, or the client disconnected
+        pass
+    finally:
+        writer.close()
+        metrics.session_finished(time.perf_counter() - start)
 
-    :return: port number.
+
+async def serve(port, metrics):
     """
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.bind((HOST, 0))
-        port = sock.getsockname()[1]
-        sock.close()
-    return port
+    Starts asyncio server on the specified port and serves it until the task is cancelled.
+
+    :param port: port number of the server.
+    :param metrics: Metrics of the server.
+    """
+    game_server = await asyncio.start_server(lambda reader, writer: play(reader, writer, metrics), HOST, port,
+                                             backlog=BACKLOG)
+    print(f"Starting the asyncio server on {HOST}:{port}")
+    async with game_server:
+        await game_server.serve_forever()
+
+
+def async_server(port, stats_interval=STATS_INTERVAL):
+    """
+    Server side of TCP guessing game running every game as a coroutine in a single event loop.
+    The user can finish the routine by Keyboard Interrupt, statistics of the server are printed then.
+
+    :param port: port number of the server.
+    :param stats_interval: period of printing statistics in seconds, 0 - only when the server stops.
+    """
+    metrics = Metrics()
+    if stats_interval:
+        dump_periodically(stats_interval, metrics.snapshot)
+    try:
+        asyncio.run(serve(port, metrics))
+    except OSError:
+        print("Error while binding to the specified port")
+    except KeyboardInterrupt:
+        print(f"Statistics: {metrics.snapshot()}")
 
 
-def server():
+def server(port, workers=WORKERS, capacity=QUEUE_SIZE, max_wait=MAX_WAIT, stats_interval=STATS_INTERVAL):
     """
     Server side of TCP guessing game.
-    Reads command line argument corresponding to the port number for the server. Parse it and check for validity.
     Creates new socket and binds to it using the address specified by programmer (default: 127.0.0.1) and port specified
     by user.
-    The user can finish the routine by Keyboard Interrupt.
-    In the loop waits for a new connection. If number of client is greater than number specified by the programmer
-    (default: 2), then server responds that it is full. Otherwise, it generates new port number and runs the thread worker
-    in the separate thread.
-    """
-    # parse command line argument
-    if len(sys.argv) != 2:
-        print("Usage example: python ./server.py <port>")
-        return
-    port = int(sys.argv[-1])
+    Starts fixed pool of worker threads, each of them plays games one by one.
+    The user can finish the routine by Keyboard Interrupt, statistics of the server are printed then.
+    In the loop waits for a new connection and passes it to admission control: the client is either handed to idle
+    worker, or waits in the queue, or is told that the server is full. Clients waiting for too long are removed.
 
+    :param port: port number of the server.
+    :param workers: number of worker threads.
+    :param capacity: maximal number of waiting clients.
+    :param max_wait: maximal waiting time of client in seconds.
+    :param stats_interval: period of printing statistics in seconds, 0 - only when the server stops.
+    """
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
 
         # try to bind to the provided port and localhost address
         try:
             sock.bind((HOST, port))
-            sock.listen(MAX_CONNECTIONS)
+            sock.listen(BACKLOG)
         except:
             print("Error while binding to the specified port")
             return
         print(f"Starting the server on {HOST}:{port}")
 
+        admission = Admission(capacity, max_wait)
+        metrics = Metrics()
+        for _ in range(workers):
+            Thread(target=worker, args=(admission, metrics), daemon=True).start()
+
+        def describe():
+            """
+            :return: dictionary with metrics of game sessions and statistics of admission.
+            """
+            return dict(metrics.snapshot(), admission=dict(admission.stats))
+
+        if stats_interval:
+            dump_periodically(stats_interval, describe)
+
+        # accept is interrupted periodically to remove clients waiting for too long
+        sock.settimeout(EXPIRY_INTERVAL)
         # continuously wait for incoming connections
         try:
-            threads = []
             while True:
-                # waiting for incoming connection
-                print("Waiting for a connection")
-                connection, host = sock.accept()
-
-                # remove threads that are not alive
-                threads = list(filter(lambda x: x.is_alive(), threads))
-
-                # check if the number of live threads not more than the max number of connections
-                if len(threads) == MAX_CONNECTIONS:
-                    connection.send("The server is full".encode())
+                try:
+                    connection, host = sock.accept()
+                except socket.timeout:
+                    admission.expire()
                     continue
-                print("Client connected")
-
-                # create new thread in which the game logic will run
-                while True:
-                    # generate available port
-                    new_port = get_free_port()
-
-                    # create and run thread
-                    thread = Thread(target=treat_client, args=(new_port,))
-                    threads.append(thread)
-                    try:
-                        threads[-1].start()
-                        break
-                    except:
-                        continue
-
-                # send new port to the client and close connection
-                connection.send(str(new_port).encode())
-                connection.close()
+                # messages of the client are waited for limited time, so that stalled client releases its worker
+                connection.settimeout(CLIENT_TIMEOUT)
+                admission.admit(connection)
+                admission.expire()
 
         except KeyboardInterrupt:
-            # print("Keyboard Interrupt, exiting")
+            print(f"Statistics: {describe()}")
             return
 
 
+def parse_arguments():
+    """
+    Function used to parse and validate command line arguments.
+    :return: port, whether to use asyncio server, number of workers, size of queue, maximal waiting time, period of
+    printing statistics.
+    """
+    if len(sys.argv) < 2 or not sys.argv[1].isdigit():
+        raise Exception('Port should be numeric.')
+    port, use_async, workers, capacity, max_wait = int(sys.argv[1]), False, WORKERS, QUEUE_SIZE, MAX_WAIT
+    stats_interval = STATS_INTERVAL
+    for argument in sys.argv[2:]:
+        if argument == '--async':
+            use_async = True
+            continue
+        name, _, value = argument.partition('=')
+        try:
+            if name == '--workers':
+                workers = int(value)
+            elif name == '--queue':
+                capacity = int(value)
+            elif name == '--wait':
+                max_wait = float(value)
+            elif name == '--stats':
+                stats_interval = float(value)
+            else:
+                raise Exception(f'Unknown argument: {argument}')
+        except ValueError:
+            raise Exception(f'Wrong value of argument: {argument}')
+    if workers < 1:
+        raise Exception('Number of workers should be positive.')
+    if capacity < 0 or max_wait < 0 or stats_interval < 0:
+        raise Exception('Size of queue, waiting time and period of statistics should be non-negative.')
+    return port, use_async, workers, capacity, max_wait, stats_interval
+
+
 if __name__ == "__main__":
-    server()
+    # parse command line arguments
+    try:
+        port, use_async, workers, capacity, max_wait, stats_interval = parse_arguments()
+    except Exception as e:
+        print(e)
+        print("Usage example: python ./server.py <port> [--async] [--workers=2] [--queue=8] [--wait=30] [--stats=10]")
+        sys.exit()
+
+    if use_async:
+        async_server(port, stats_interval)
+    else:
+        server(port, workers, capacity, max_wait, stats_interval)
@@ -10,6 +10,10 @@ import sys
 import os
 
 FILEPATH = 'client_files/'
+# files larger than this number of bytes are sent by chunks
+CHUNKED_THRESHOLD = 1 << 22
+# size of chunk of uploaded and downloaded files in bytes
+CHUNK_SIZE = 1 << 20
 
 
 def client():
@@ -21,6 +25,7 @@ def client():
     - list files
     - save files
     - send files
+    Files larger than CHUNKED_THRESHOLD are sent by chunks, files are received by chunks.
     Evaluate expressions.
     Parses command line arguments: host address and port number.
     Connects to XML RPC server using the provided information.
@@ -43,6 +48,9 @@ def client():
         # check if file exists
         if not os.path.isfile(FILEPATH + filename):
             return False, "No such file"
+        # large file is sent by chunks
+        if os.path.getsize(FILEPATH + filename) > CHUNKED_THRESHOLD:
+            return send_chunked(filename)
         # open the file in binary format
         with open(FILEPATH + filename, "rb") as file:
             binary = xmlrpc.client.Binary(file.read())
@@ -53,6 +61,50 @@ def client():
             return False, "File already exists"
         return True, None
 
+    def send_chunked(filename):
+        """
+        Function sending file with a given name to the server by chunks, so that the file is not read into memory
+        and each request is of bounded size.
+
+        :param filename: name of file.
+        :return: <True/False>, <None/error>
+        """
+        handle = proxy.open_upload(filename)
+        if not handle:
+            return False, "File already exists"
+        # upload that is not committed (error or Keyboard Interrupt) is cancelled, so that the server releases it
+        committed = False
+        try:
+            with open(FILEPATH + filename, "rb") as file:
+                offset = 0
+                while True:
+                    chunk = file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if not proxy.write_chunk(handle, offset, xmlrpc.client.Binary(chunk)):
+                        return False, "Upload is lost"
+                    offset += len(chunk)
+            # check if file was saved
+            committed = True
+            if not proxy.commit(handle):
+                return False, "File already exists"
+            return True, None
+        finally:
+            if not committed:
+                abort(handle)
+
+    def abort(handle):
+        """
+        Function cancelling upload or download on the server, the server might be unavailable already.
+
+        :param handle: handle of upload or download.
+        :return: True if handle is released on the server, False otherwise.
+        """
+        try:
+            return proxy.abort(handle)
+        except (OSError, xmlrpc.client.Error):
+            return False
+
     def list_files(arguments):
         """
         Function printing filenames in server directory.
@@ -83,35 +135,48 @@ def client():
     def get_file(arguments):
         """
         Function saving file from server with a given name.
-        Invokes method to get file.
-        Check if the file with given name exists in server directory.
         Check if file already exists in client directory.
-        Save the received binary data as file.
+        Opens download of file and checks if the file with given name exists in server directory.
+        Receives the file by chunks and saves them.
 
         :param arguments: filename, new filename (optional).
         :return: <True/False>, <None/error>
         """
-        # parse file name
+        # parse file name and compose path to save file, if name to save file specified use it
         filename = arguments[0]
-        # get the data from server
-        binary = proxy.get_file(filename)
+        path = FILEPATH + (arguments[1] if len(arguments) == 2 else filename)
+        # check if file exists before it is downloaded
+        if os.path.isfile(path):
+            return False, "File already exists"
 
+        # size of file is known only after download is opened, file of one chunk is read by a single request
+        download = proxy.open_download(filename)
         # if False received return error message
-        if not binary:
+        if not download:
             return False, "No such file"
+        handle, size = download
 
-        # if name to save file specified use it
-        if len(arguments) == 2:
-            filename = arguments[1]
-        # compose path to file
-        filename = FILEPATH + filename
-        # check if file exists
-        if os.path.isfile(filename):
-            return False, "File already exists"
-        # save the file
-        with open(filename, "wb") as file:
-            file.write(binary.data)
-        return True, None
+        # save the file chunk by chunk, incomplete file is removed and its download is cancelled
+        completed = False
+        try:
+            with open(path, "wb") as file:
+                offset = 0
+                while True:
+                    # the server releases download once its last chunk is read, so it is read even for empty file
+                    binary = proxy.read_chunk(handle, offset, CHUNK_SIZE)
+                    if binary is False or not binary.data and offset < size:
+                        return False, "Download is lost"
+                    file.write(binary.data)
+                    offset += len(binary.data)
+                    if offset >= size:
+                        break
+            completed = True
+            return True, None
+        finally:
+            if not completed:
+                if os.path.isfile(path):
+                    os.remove(path)
+                abort(handle)
 
     def calculate(arguments):
         """
@@ -9,8 +9,20 @@ import sys
 from xmlrpc.server import SimpleXMLRPCServer
 import xmlrpc.client
 import os
+import time
+import shutil
+import secrets
+import functools
+
+from cache import LRUCache, MISSING
 
 FILEPATH = 'server_files/'
+# files being uploaded by chunks are kept here until they are committed, so that they are not listed
+PARTIAL_FILEPATH = 'server_partial/'
+# maximal size of chunk returned by read_chunk in bytes
+MAX_CHUNK = 1 << 22
+# upload or download that has not been used for this number of seconds is released
+HANDLE_TIMEOUT = 60
 
 
 class DivisionByZeroError(Exception):
@@ -31,10 +43,13 @@ def server():
     - list files
     - save files
     - send files
+    Large files are uploaded and downloaded by chunks through handles: open_upload, write_chunk, commit and
+    open_download, read_chunk. Handle is released by abort or after HANDLE_TIMEOUT seconds of inactivity.
     Performs evaluating of expressions. Supports operations *, /, -, +, >, <, >=, <=.
-    Parses command line arguments: host address and port number.
+    Parses command line arguments: host address, port number and optional size of cache of calculation results.
     Established XML RPC server using the provided information.
-    Registers functions send_file, list_files, delete_file, get_file, calculate.
+    Registers functions send_file, list_files, delete_file, get_file, open_upload, write_chunk, commit, open_download,
+    read_chunk, abort, calculate, cache_stats.
     Serve the incoming connections until Keyboard interrupt.
     """
 
@@ -100,7 +115,180 @@ def server():
         print(f"File send: {filename}")
         return binary
 
+    def release(handle):
+        """
+        Closes the file of upload or download. Partial file of upload is removed.
+
+        :param handle: handle of upload or download.
+        :return: True if handle is released, False if there is no such handle.
+        """
+        if handle in uploads:
+            upload = uploads.pop(handle)
+            upload['file'].close()
+            os.remove(upload['path'])
+            return True
+        if handle in downloads:
+            downloads.pop(handle)['file'].close()
+            return True
+        return False
+
+    def expire_handles():
+        """
+        Releases uploads and downloads that have not been used for HANDLE_TIMEOUT seconds.
+
+        :return: number of released handles.
+        """
+        deadline = time.time() - HANDLE_TIMEOUT
+        released = 0
+        for handles in (uploads, downloads):
+            for handle in [handle for handle, entry in handles.items() if entry['last'] < deadline]:
+                print(f"{handles[handle]['filename']} released after inactivity")
+                release(handle)
+                released += 1
+        return released
+
+    def expiring(function):
+        """
+        Wraps function registered on the server, so that idle handles are expired on each request.
+
+        :param function: function responding to XML-RPC request.
+        :return: wrapped function with the same name.
+        """
+        @functools.wraps(function)
+        def wrapper(*args):
+            expire_handles()
+            return function(*args)
+        return wrapper
+
+    def abort(handle):
+        """
+        Function cancelling upload or download, partial file of upload is removed.
+
+        :param handle: handle of upload or download.
+        :return: True if handle is released, False if there is no such handle.
+        """
+        return release(handle)
+
+    def open_upload(filename):
+        """
+        Function starting upload of file by chunks.
+        Check whether there is a file or upload with the same name.
+        Creates partial file, which is moved to the server directory on commit.
+
+        :param filename: name of file.
+        :return: handle of upload, False if file already exists.
+        """
+        if os.path.isfile(FILEPATH + filename) or any(upload['filename'] == filename for upload in uploads.values()):
+            print(f"{filename} not saved")
+            return False
+        handle = secrets.token_hex(8)
+        os.makedirs(PARTIAL_FILEPATH, exist_ok=True)
+        path = PARTIAL_FILEPATH + handle
+        uploads[handle] = {'filename': filename, 'path': path, 'file': open(path, "wb"), 'last': time.time()}
+        return handle
+
+    def write_chunk(handle, offset, data):
+        """
+        Function writing chunk of uploaded file. Chunk written again (repeated request) overwrites the same bytes.
+
+        :param handle: handle of upload.
+        :param offset: offset of chunk in file.
+        :param data: binary data of chunk.
+        :return: True if chunk is written, False if there is no such upload or offset is negative.
+        """
+        if handle not in uploads or offset < 0:
+            return False
+        uploads[handle]['last'] = time.time()
+        file = uploads[handle]['file']
+        file.seek(offset)
+        file.write(data.data)
+        return True
+
+    def commit(handle):
+        """
+        Function finishing upload of file.
+        Moves the partial file to the server directory, unless file with the same name has appeared meanwhile.
+
+        :param handle: handle of upload.
+        :return: True if file is saved, False - otherwise.
+        """
+        if handle not in uploads:
+            return False
+        upload = uploads.pop(handle)
+        upload['file'].close()
+        if os.path.isfile(FILEPATH + upload['filename']):
+            os.remove(upload['path'])
+            print(f"{upload['filename']} not saved")
+            return False
+        os.replace(upload['path'], FILEPATH + upload['filename'])
+        print(f"{upload['filename']} saved")
+        return True
+
+    def open_download(filename):
+        """
+        Function starting download of file by chunks.
+        Check whether there is a file with the same name.
+
+        :param filename: name of file.
+        :return: handle of download and size of file, False if there is no such file.
+        """
+        if not os.path.isfile(FILEPATH + filename):
+            print(f"No such file: {filename}")
+            return False
+        handle = secrets.token_hex(8)
+        file = open(FILEPATH + filename, "rb")
+        downloads[handle] = {'filename': filename, 'file': file, 'size': os.fstat(file.fileno()).st_size,
+                             'last': time.time()}
+        return handle, downloads[handle]['size']
+
+    def read_chunk(handle, offset, size):
+        """
+        Function returning chunk of downloaded file. Download is closed when its last chunk is read.
+
+        :param handle: handle of download.
+        :param offset: offset of chunk in file.
+        :param size: size of chunk, at most MAX_CHUNK.
+        :return: binary data of chunk, False if there is no such download or offset is negative.
+        """
+        if handle not in downloads or offset < 0:
+            return False
+        download = downloads[handle]
+        download['last'] = time.time()
+        download['file'].seek(offset)
+        data = download['file'].read(max(0, min(size, MAX_CHUNK)))
+        if offset + len(data) >= download['size']:
+            downloads.pop(handle)['file'].close()
+            print(f"File send: {download['filename']}")
+        return xmlrpc.client.Binary(data)
+
     def calculate(expression):
+        """
+        Function returning the result of evaluation of expression.
+        If cache is enabled, repeated expressions (including the wrong ones) are answered without parsing and
+        computation.
+
+        :param expression: string in the form <operator> <left operand> <right operand>.
+        :return: <True/False>, <None/Error>
+        """
+        if cache is None:
+            return evaluate(expression)
+        result = cache.get(expression)
+        if result is MISSING:
+            result = evaluate(expression)
+            cache.put(expression, result)
+        else:
+            print(f"{expression} -- {'done' if result[0] else 'not done'} (cached)")
+        return result
+
+    def cache_stats():
+        """
+        Function returning counters of the cache of calculation results.
+
+        :return: dictionary with size, hits, misses and evictions, empty dictionary if cache is disabled.
+        """
+        return cache.stats() if cache is not None else {}
+
+    def evaluate(expression):
         """
         Function evaluating expression in the form <operator> <left operand> <right operand>.
         Splits up the expression in the tokens and checks whether there are three of them.
@@ -191,26 +379,43 @@ def server():
         print(f"{expression} -- done")
         return True, result
 
-    # parse command line argument
-    if len(sys.argv) != 3:
-        print("Usage example: python server.py <address> <port>")
+    # parse command line argument, port and size of cache should be non-negative integers
+    if len(sys.argv) not in [3, 4] or not all(argument.isdigit() for argument in sys.argv[2:]):
+        print("Usage example: python server.py <address> <port> [cache size]")
         return
     host = sys.argv[1]
-    port = int(sys.argv[-1])
+    port = int(sys.argv[2])
+    # cache of calculation results is disabled by default
+    cache_size = int(sys.argv[3]) if len(sys.argv) == 4 else 0
+    cache = LRUCache(cache_size) if cache_size > 0 else None
+    # uploads and downloads by chunks in progress: handle -> name of file, opened file, time of last request
+    uploads, downloads = {}, {}
+    # partial files left by the server that was killed are never committed
+    shutil.rmtree(PARTIAL_FILEPATH, ignore_errors=True)
 
     # catch Keyboard Interrupt exception
     try:
         with SimpleXMLRPCServer((host, port), logRequests=False) as server_obj:
             # register functions that respond to XML-RPC requests
             server_obj.register_introspection_functions()
-            server_obj.register_function(send_file)
-            server_obj.register_function(list_files)
-            server_obj.register_function(delete_file)
-            server_obj.register_function(get_file)
-            server_obj.register_function(calculate)
+            server_obj.register_function(expiring(send_file))
+            server_obj.register_function(expiring(list_files))
+            server_obj.register_function(expiring(delete_file))
+            server_obj.register_function(expiring(get_file))
+            server_obj.register_function(expiring(open_upload))
+            server_obj.register_function(expiring(write_chunk))
+            server_obj.register_function(expiring(commit))
+            server_obj.register_function(expiring(open_download))
+            server_obj.register_function(expiring(read_chunk))
+            server_obj.register_function(expiring(abort))
+            server_obj.register_function(expiring(calculate))
+            server_obj.register_function(expiring(cache_stats))
             # run server
             server_obj.serve_forever()
     except KeyboardInterrupt:
+        # uploads in progress are not committed, their partial files are removed
+        for handle in list(uploads) + list(downloads):
+            release(handle)
         print("Server is stopping")
 
 